@@ -0,0 +1,3 @@
+"""Floor plan detection and conversion, usable without the Tk GUI."""
+
+from floorplan.engine import AnalysisCancelled, PlanResult, analyze
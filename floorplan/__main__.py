@@ -0,0 +1,5 @@
+import sys
+
+from floorplan.cli import main
+
+sys.exit(main())
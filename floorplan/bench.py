@@ -0,0 +1,247 @@
+"""Benchmark harness: ``python -m floorplan bench``.
+
+Every case is a synthetic plan (floorplan.synthetic) of a given size and
+density. It is run in a fresh worker process, so the peak RSS reported for a
+case belongs to that case alone. Per case, each stage is timed `repeat` times
+and the best and mean times are kept, together with a throughput figure:
+
+- detect_walls / detect_curved_walls: megapixels per second
+- detect_geometry: both, sharing one preprocessing pass (on two threads up to 12 MP), megapixels per second
+- merge_lines: raw Hough segments per second
+- detect_openings: walls per second, and milliseconds per wall
+- segment_rooms: megapixels of plan per second
+- parse_room_text: label strings per second
+- extract_room_descriptions: OCR words per second, grouped into labels and parsed
+  (the plan's own labels, as a perfect OCR pass would return them)
+- parse_many: label strings per second over a corpus of PARSE_CORPUS_SIZE labels in
+  feet-inch, plain and metric notations (floorplan.synthetic.label_corpus)
+- build_scene: scene parts per second; merged_meshes: parts per second
+- load_stored_scene: parts per second, reading the merged meshes back from a
+  project saved with them (floorplan.project artifacts) instead of building them
+
+Results are written as JSON with the commit, Python and platform, and a
+previous result file can be passed as a baseline to print speed-ups.
+"""
+
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from floorplan import engine
+from floorplan.dimensions import parse_many
+from floorplan.openings import detect_openings
+from floorplan.preprocess import preprocess
+from floorplan.profiling import _peak_rss_mb
+from floorplan.rooms import assign_rooms, segment_rooms
+from floorplan.project import build_project_data, load_artifacts, save_project
+from floorplan.scene import StoredScene, build_scene
+from floorplan.synthetic import label_corpus, make_plan
+
+RESULT_VERSION = 1
+DEFAULT_SIZES = ((1000, 750), (2000, 1500), (4000, 3000))
+PARSE_ROUNDS = 200 # The label list is parsed this many times per repeat, to get a measurable time
+PARSE_CORPUS_SIZE = 50000
+
+
+def _quiet():
+    # The engine reports its progress with print; keep it out of the benchmark output
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _time_stage(fn, repeat):
+    times = []
+    value = None
+    for _ in range(repeat):
+        with _quiet():
+            start = time.perf_counter()
+            value = fn()
+            times.append(time.perf_counter() - start)
+    return value, {"best_s": round(min(times), 6), "mean_s": round(sum(times) / len(times), 6)}
+
+
+def _with_throughput(stats, amount, unit):
+    stats["throughput"] = round(amount / stats["best_s"], 3) if stats["best_s"] > 0 else None
+    stats["unit"] = unit
+    return stats
+
+
+def _parsed_correctly(value, width_ft, length_ft):
+    # A parse result against the true size; width_ft None means the label has no dimensions
+    if width_ft is None: return value is None
+    return value is not None and abs(value[0] - width_ft) < 0.05 and abs(value[1] - length_ft) < 0.05
+
+
+def _openings_found(walls, truth_openings):
+    # Drawn openings with a detected opening of the same type within half their width of the centre
+    centers = []
+    for wall in walls:
+        (x1, y1), (x2, y2) = wall["start"], wall["end"]
+        for opening in wall.get("openings", []):
+            t = opening["position_on_wall"] / wall["length"] if wall["length"] else 0.0
+            centers.append((opening["type"], x1 + (x2 - x1) * t, y1 + (y2 - y1) * t))
+    return sum(1 for truth in truth_openings
+               if any(kind == truth["type"] and math.hypot(x - truth["center"][0], y - truth["center"][1])
+                      < truth["width_px"] / 2 for kind, x, y in centers))
+
+
+def run_case(width, height, n_walls, n_curves, n_labels, repeat=3, seed=0, scale_factor=None):
+    """Time every stage on one synthetic plan; returns a JSON-ready dict.
+
+    Without scale_factor the plan's own scale (3 ft doors) is used.
+    """
+    image, truth = make_plan(width, height, n_walls, n_curves, n_labels, seed=seed)
+    scale_factor = scale_factor or truth["scale_factor"]
+    megapixels = width * height / 1e6
+    results = {}
+
+    walls, stats = _time_stage(lambda: engine.detect_walls(image), repeat)
+    results["detect_walls"] = _with_throughput(stats, megapixels, "MP/s")
+
+    with _quiet():
+        raw_lines = engine._wall_hough_segments(preprocess(image).blurred)
+    n_raw = 0 if raw_lines is None else len(raw_lines)
+    if n_raw:
+        _, stats = _time_stage(lambda: engine.merge_lines(raw_lines, angle_threshold_deg=7, dist_threshold_px=25),
+                               repeat)
+        results["merge_lines"] = _with_throughput(stats, n_raw, "segments/s")
+
+    curves, stats = _time_stage(lambda: engine.detect_curved_walls(image), repeat)
+    results["detect_curved_walls"] = _with_throughput(stats, megapixels, "MP/s")
+    _, stats = _time_stage(lambda: engine.detect_geometry(image), repeat)
+    results["detect_geometry"] = _with_throughput(stats, megapixels, "MP/s")
+
+    texts = [f"{label['name']} {label['text']}" for label in truth["labels"]]
+    if texts:
+        parsed, stats = _time_stage(lambda: [engine.parse_room_text(t) for _ in range(PARSE_ROUNDS) for t in texts],
+                                    repeat)
+        results["parse_room_text"] = _with_throughput(stats, len(texts) * PARSE_ROUNDS, "strings/s")
+        parsed_ok = sum(1 for value, label in zip(parsed[:len(texts)], truth["labels"])
+                        if _parsed_correctly(value, label["width_ft"], label["length_ft"]))
+    else:
+        parsed_ok = 0
+
+    def extract_rooms():
+        rooms = {}
+        engine.extract_room_descriptions(truth["ocr"], rooms, {}, scale_factor)
+        return rooms
+
+    extracted, stats = _time_stage(extract_rooms, repeat)
+    results["extract_room_descriptions"] = _with_throughput(stats, len(truth["ocr"]), "words/s")
+    labels_read = sum(1 for label in truth["labels"]
+                      if any(_parsed_correctly((room["width"], room["length"]), label["width_ft"], label["length_ft"])
+                             for room in extracted.values()))
+
+    corpus = label_corpus(PARSE_CORPUS_SIZE, seed=seed)
+    corpus_texts = [text for text, _, _ in corpus]
+    parsed, stats = _time_stage(lambda: parse_many(corpus_texts), repeat)
+    results["parse_many"] = _with_throughput(stats, len(corpus), "strings/s")
+    corpus_ok = sum(1 for value, (_, width_ft, length_ft) in zip(parsed, corpus)
+                    if _parsed_correctly(value, width_ft, length_ft))
+
+    detected_walls = len(walls)
+    walls, stats = _time_stage(lambda: detect_openings(image, walls, scale_factor), repeat)
+    stats["per_wall_ms"] = round(stats["best_s"] * 1000 / detected_walls, 4) if detected_walls else None
+    results["detect_openings"] = _with_throughput(stats, detected_walls, "walls/s")
+    segmented, stats = _time_stage(lambda: segment_rooms(walls, curves, image.shape, scale_factor), repeat)
+    results["segment_rooms"] = _with_throughput(stats, megapixels, "MP/s")
+
+    rooms = {f"{label['name']} {i}": {"position": (label["position"][0] / scale_factor,
+                                                   label["position"][1] / scale_factor),
+                                      "width": label["width_ft"], "length": label["length_ft"],
+                                      "type": engine.determine_room_type(label["name"])}
+             for i, label in enumerate(truth["labels"])}
+    assign_rooms(rooms, {}, segmented, scale_factor)
+    model_scene, stats = _time_stage(lambda: build_scene(walls, curves, rooms, scale_factor, 9.0, 0.5), repeat)
+    results["build_scene"] = _with_throughput(stats, model_scene.n_parts, "parts/s")
+    _, stats = _time_stage(model_scene.merged, repeat)
+    results["merged_meshes"] = _with_throughput(stats, model_scene.n_parts, "parts/s")
+    with tempfile.TemporaryDirectory() as tmp:
+        project_path = os.path.join(tmp, "plan.npz")
+        save_project(project_path, build_project_data(None, rooms, walls, curves, scale_factor, {}),
+                     {"scene": StoredScene.from_scene(model_scene).as_artifact()})
+        _, stats = _time_stage(lambda: load_artifacts(project_path, meshes=True), repeat)
+    results["load_stored_scene"] = _with_throughput(stats, model_scene.n_parts, "parts/s")
+
+    return {
+        "name": f"{width}x{height}-w{n_walls}-c{n_curves}-l{n_labels}",
+        "width": width, "height": height, "walls": n_walls, "curves": n_curves, "labels": n_labels,
+        "seed": seed, "repeat": repeat,
+        "scale_factor": round(scale_factor, 3),
+        "detected": {"walls": detected_walls, "curved_walls": len(curves), "raw_segments": n_raw,
+                     "labels_parsed": parsed_ok, "labels_read": labels_read, "corpus_parsed": corpus_ok,
+                     "corpus_size": len(corpus), "openings": _openings_found(walls, truth["openings"]),
+                     "openings_drawn": len(truth["openings"]), "rooms_segmented": len(segmented),
+                     "scene_parts": model_scene.n_parts},
+        "results": results,
+        "peak_rss_mb": None if _peak_rss_mb() is None else round(_peak_rss_mb(), 1),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, n_walls=40, n_curves=4, n_labels=12, repeat=3, seed=0, isolate=True):
+    cases = []
+    for width, height in sizes:
+        args = (width, height, n_walls, n_curves, n_labels, repeat, seed)
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1) as pool: # Fresh process per case: its own peak RSS
+                case = pool.submit(run_case, *args).result()
+        else:
+            case = run_case(*args)
+        print(format_case(case))
+        cases.append(case)
+    return {
+        "version": RESULT_VERSION,
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "cases": cases,
+    }
+
+
+def format_case(case):
+    parts = [f"{stage} {stats['best_s'] * 1000:.1f}ms ({stats['throughput']} {stats['unit']})"
+             for stage, stats in case["results"].items()]
+    detected = case.get("detected", {})
+    if "openings" in detected:
+        parts.append(f"openings found {detected['openings']}/{detected['openings_drawn']}")
+    if "labels_read" in detected:
+        parts.append(f"labels read {detected['labels_read']}/{case['labels']}")
+    if "corpus_parsed" in detected:
+        parts.append(f"labels parsed {detected['corpus_parsed']}/{detected['corpus_size']}")
+    return f"{case['name']}: " + ", ".join(parts) + f"; peak RSS {case['peak_rss_mb']} MB"
+
+
+def compare(current, baseline):
+    # Lines like "2000x1500-w40-c4-l12 detect_walls: 1.35x faster" for stages present in both runs
+    baseline_cases = {case["name"]: case for case in baseline.get("cases", [])}
+    lines = []
+    for case in current["cases"]:
+        old = baseline_cases.get(case["name"])
+        if old is None: continue
+        for stage, stats in case["results"].items():
+            old_stats = old["results"].get(stage)
+            if not old_stats or not stats["best_s"]: continue
+            ratio = old_stats["best_s"] / stats["best_s"]
+            lines.append(f"{case['name']} {stage}: {ratio:.2f}x " + ("faster" if ratio >= 1 else "slower"))
+    return lines
+
+
+def write_results(path, results):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=4)
+    return path
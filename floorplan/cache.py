@@ -0,0 +1,136 @@
+"""Content-addressed on-disk cache for OCR and detection results.
+
+Entries are keyed by a hash of the decoded image pixels plus the stage name and
+its parameters, and stored as small JSON files. When the directory grows past
+max_bytes the least recently used entries (oldest modification time; hits
+refresh it) are deleted, down to EVICT_TARGET of max_bytes so the next writes
+do not evict again. The directory size is tracked in memory between scans.
+Several processes may share one directory: writes go through a temporary file
+and an atomic rename, and every RESCAN_PUTS writes the directory is rescanned
+to count what the other processes wrote.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+EVICT_TARGET = 0.9 # Fraction of max_bytes left after an eviction
+RESCAN_PUTS = 256
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "floorplan")
+
+
+def cache_from_env():
+    # FLOORPLAN_CACHE=0 disables; FLOORPLAN_CACHE_DIR / FLOORPLAN_CACHE_MAX_MB override the defaults
+    if os.environ.get("FLOORPLAN_CACHE", "1").strip().lower() in ("0", "off", "false", "no"):
+        return None
+    max_mb = os.environ.get("FLOORPLAN_CACHE_MAX_MB")
+    try:
+        return DetectionCache(os.environ.get("FLOORPLAN_CACHE_DIR"),
+                              int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES)
+    except (OSError, ValueError) as e:
+        print(f"Detection cache disabled: {e}")
+        return None
+
+
+def image_digest(image):
+    # Hash of the pixels (plus shape/dtype) so re-encoded copies of the same plan still hit
+    hasher = hashlib.sha256()
+    hasher.update(f"{image.shape}|{image.dtype}".encode())
+    hasher.update(memoryview(image if image.flags.c_contiguous else image.copy()).cast("B"))
+    return hasher.hexdigest()
+
+
+class DetectionCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None # Bytes in the directory as of the last scan plus our writes since; None until scanned
+        self._puts_since_scan = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, digest, stage, params):
+        params_json = json.dumps(params or {}, sort_keys=True)
+        key = hashlib.sha256(f"{digest}|{stage}|{params_json}".encode()).hexdigest()
+        return os.path.join(self.directory, f"{stage}-{key}.json")
+
+    def get(self, digest, stage, params=None):
+        path = self._path(digest, stage, params)
+        try:
+            with open(path, "r") as f:
+                value = json.load(f)
+            os.utime(path) # Mark as recently used
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, digest, stage, params, value):
+        path = self._path(digest, stage, params)
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(value, f)
+                size = f.tell()
+            try:
+                size -= os.stat(path).st_size # Replaced entry
+            except OSError:
+                pass
+            os.replace(tmp_path, path)
+            tmp_path = None
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Could not write cache entry {os.path.basename(path)}: {e}")
+            return
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        self._puts_since_scan += 1
+        if self._size is not None:
+            self._size += size
+        if self._size is None or self._size > self.max_bytes or self._puts_since_scan >= RESCAN_PUTS:
+            self.evict()
+
+    def evict(self):
+        # Scans the directory; removes the least recently used entries if it is over max_bytes
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"): continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue # Removed by another process
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        self._puts_since_scan = 0
+        if total > self.max_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes * EVICT_TARGET: break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+        self._size = total
+
+    def clear(self):
+        self._size = None
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith((".json", ".tmp")):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
@@ -0,0 +1,352 @@
+"""Headless batch commands.
+
+``python -m floorplan convert plans/ --scale 10`` turns images into project JSON files,
+``python -m floorplan export converted/ --png`` turns project files into 3D models,
+``python -m floorplan bench -o bench.json`` times the pipeline on synthetic plans.
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image
+
+from floorplan import bench
+from floorplan import engine
+from floorplan import ocr
+from floorplan import profiling
+from floorplan.cache import DEFAULT_MAX_BYTES, DetectionCache
+from floorplan.export import MODEL_FORMATS, export_project, project_scene
+from floorplan.imageio import load_image
+from floorplan.profiling import Profile
+from floorplan.preview import PreviewCache
+from floorplan.project import (ARTIFACTS_SUFFIX, PREVIEW_MAX_SIDE, PROJECT_EXTENSIONS, ProjectFile,
+                               build_project_data, load_project, save_project)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".pgm", ".ppm")
+
+GPU_CHOICES = {"auto": None, "on": True, "off": False}
+
+_worker_cache = None
+
+
+def _init_worker(gpu, model_dir, cache_dir, cache_max_bytes):
+    # A forked worker inherits the CPU reader preloaded by the parent and this is a no-op; a spawned one loads its own
+    global _worker_cache
+    ocr.configure_reader(gpu=gpu, model_dir=model_dir)
+    ocr.get_reader()
+    _worker_cache = DetectionCache(cache_dir, cache_max_bytes) if cache_dir else None
+
+
+def _output_path(output_dir, stem, suffix):
+    path = os.path.join(output_dir, stem + suffix)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def _profile_paths(profile_dir, stem, cprofile, command):
+    if not profile_dir:
+        return None, None
+    stem = _output_path(profile_dir, stem, "." + command)
+    return stem + ".profile.json", (stem + ".prof" if cprofile else None)
+
+
+def _project_artifacts(result, project_data, preview_levels, profile):
+    # OCR results, previews and the default 3D model, so opening or exporting the project recomputes nothing
+    model_scene = project_scene(project_data, project_data["default_height"], project_data["wall_thickness"],
+                                profile=profile)
+    return {"ocr_results": result.ocr_results or None, "preview_levels": preview_levels, "scene": model_scene.as_artifact()}
+
+
+def _convert_one(image_path, stem, scale, output_dir, tile_size=None, coarse_scale=None, profile_dir=None,
+                 cprofile=False, project_format="json", artifacts=False):
+    report_path, prof_path = _profile_paths(profile_dir, stem, cprofile, "convert")
+    profile = Profile()
+    with profiling.cprofile(prof_path):
+        preview_levels = None
+        if artifacts:
+            # From the source image as the GUI displays it (colour stays colour), like its Save Project; the full-size
+            # decode is dropped before detection starts
+            with profile.stage("preview_levels"), Image.open(image_path) as source:
+                preview_levels = PreviewCache(source).stored_levels(PREVIEW_MAX_SIDE)
+        # Grayscale, decoded once (memory-mapped for big raw scans) and masked in place: see floorplan.imageio
+        with profile.stage("image_decode"):
+            plan_image = load_image(image_path, grayscale=True)
+        result = engine.analyze(plan_image, scale, reader=ocr.get_reader(), report_status=lambda message: None,
+                                cache=_worker_cache, tile_size=tile_size, coarse_scale=coarse_scale, inplace=True,
+                                profile=profile)
+        del plan_image
+        if result.ocr_error:
+            # A project without its room labels and dimensions is not a successful conversion
+            raise RuntimeError(f"OCR failed: {result.ocr_error}")
+
+        project_data = build_project_data(os.path.abspath(image_path), result.room_dimensions, result.walls,
+                                          result.curved_walls, result.scale_factor, result.room_positions)
+        out_path = _output_path(output_dir, stem, "." + project_format)
+        project_artifacts = _project_artifacts(result, project_data, preview_levels, profile) if artifacts else None
+        with profile.stage("save_project"):
+            save_project(out_path, project_data, project_artifacts)
+    if report_path:
+        profile.write_json(report_path, command="convert", image=os.path.abspath(image_path), scale=scale,
+                           tile_size=tile_size, coarse_scale=coarse_scale, walls=len(result.walls),
+                           curved_walls=len(result.curved_walls), rooms=len(result.room_dimensions))
+    return out_path, len(result.room_dimensions), len(result.walls), len(result.curved_walls), result.timings
+
+
+def collect_paths(inputs, extensions):
+    paths = []
+    seen = set() # A file matched by several inputs is processed once
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = [os.path.join(item, name) for name in sorted(os.listdir(item))]
+        else:
+            candidates = sorted(glob.glob(item))
+        for c in candidates:
+            if os.path.isfile(c) and c.lower().endswith(extensions) and os.path.realpath(c) not in seen:
+                seen.add(os.path.realpath(c))
+                paths.append(c)
+    return paths
+
+
+def output_stems(paths):
+    """{path: output name without extension}, relative to the common directory of all paths.
+
+    Plans in one directory keep their plain file names; plans with the same name in different directories keep
+    their relative directories, so they do not overwrite each other. Raises ValueError when two paths still map
+    to the same name (e.g. plan.png and plan.jpg side by side).
+    """
+    base = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    stems = {}
+    owners = {}
+    for path in paths:
+        stem = os.path.splitext(os.path.relpath(os.path.abspath(path), base))[0]
+        owner = owners.setdefault(os.path.normcase(stem), path)
+        if owner != path:
+            raise ValueError(f"{owner} and {path} would both be written as '{stem}'")
+        stems[path] = stem
+    return stems
+
+
+def collect_image_paths(inputs):
+    return collect_paths(inputs, IMAGE_EXTENSIONS)
+
+
+def convert_batch(inputs, scale, output_dir, workers=None, gpu=None, model_dir=None,
+                  cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES, tile_size=None, coarse_scale=None,
+                  profile_dir=None, cprofile=False, project_format="json", artifacts=False):
+    image_paths = collect_image_paths(inputs)
+    if not image_paths:
+        print("No floor plan images found.")
+        return 1
+    try:
+        stems = output_stems(image_paths)
+    except ValueError as e:
+        print(f"Cannot convert: {e}. Convert them in separate runs or rename one.")
+        return 1
+    os.makedirs(output_dir, exist_ok=True)
+    if profile_dir: os.makedirs(profile_dir, exist_ok=True)
+
+    ocr.configure_reader(gpu=gpu, model_dir=model_dir)
+    gpu = ocr.reader_uses_gpu()
+    mp_context = None
+    if gpu:
+        # CUDA cannot be re-initialised in a forked child: spawned workers each load their own reader
+        mp_context = multiprocessing.get_context("spawn")
+    elif "fork" in multiprocessing.get_all_start_methods():
+        # Load the CPU OCR weights once here; forked workers share them copy-on-write
+        ocr.preload_reader()
+        mp_context = multiprocessing.get_context("fork")
+
+    failures = 0
+    total_timings = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=mp_context,
+                             initializer=_init_worker, initargs=(gpu, model_dir, cache_dir, cache_max_bytes)) as pool:
+        futures = {pool.submit(_convert_one, path, stems[path], scale, output_dir, tile_size, coarse_scale, profile_dir,
+                               cprofile, project_format, artifacts): path
+                   for path in image_paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                out_path, n_rooms, n_walls, n_curves, timings = future.result()
+                print(f"{os.path.basename(path)} -> {out_path}: {n_rooms} rooms, {n_walls} walls, {n_curves} curves "
+                      f"({engine.format_timings(timings)})")
+                for stage, seconds in timings.items():
+                    total_timings[stage] = total_timings.get(stage, 0.0) + seconds
+            except Exception as e:
+                failures += 1
+                print(f"Failed to convert {path}: {e}")
+    print(f"Converted {len(image_paths) - failures}/{len(image_paths)} floor plans.")
+    if total_timings:
+        print(f"Total time per stage: {engine.format_timings(total_timings)}")
+    return 1 if failures else 0
+
+
+def _export_one(project_path, stem, output_dir, model_format, png, height_ft, wall_thickness_ft, profile_dir=None,
+                cprofile=False):
+    model_path = _output_path(output_dir, stem, model_format) if model_format else None
+    png_path = _output_path(output_dir, stem, ".png") if png else None
+    report_path, prof_path = _profile_paths(profile_dir, stem, cprofile, "export")
+    profile = Profile()
+    with profiling.cprofile(prof_path):
+        with profile.stage("load_project"):
+            project_data = load_project(project_path)
+        model_scene = export_project(project_data, model_path, png_path, height_ft, wall_thickness_ft, profile,
+                                     project_path)
+        if isinstance(project_data, ProjectFile): project_data.close()
+    if report_path:
+        profile.write_json(report_path, command="export", project=os.path.abspath(project_path),
+                           model=model_path, png=png_path, parts=model_scene.n_parts)
+    return [path for path in (model_path, png_path) if path], model_scene.n_parts
+
+
+def export_batch(inputs, output_dir, model_format=".gltf", png=False, workers=None, height_ft=None,
+                 wall_thickness_ft=None, profile_dir=None, cprofile=False):
+    project_paths = [path for path in collect_paths(inputs, PROJECT_EXTENSIONS) if not path.endswith(ARTIFACTS_SUFFIX)]
+    if not project_paths:
+        print("No project files found.")
+        return 1
+    try:
+        stems = output_stems(project_paths)
+    except ValueError as e:
+        print(f"Cannot export: {e}. Export them in separate runs or rename one.")
+        return 1
+    os.makedirs(output_dir, exist_ok=True)
+    if profile_dir: os.makedirs(profile_dir, exist_ok=True)
+
+    failures = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {pool.submit(_export_one, path, stems[path], output_dir, model_format, png, height_ft,
+                               wall_thickness_ft, profile_dir, cprofile): path
+                   for path in project_paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                written, n_parts = future.result()
+                print(f"{os.path.basename(path)} -> {', '.join(written)} ({n_parts} parts)")
+            except Exception as e:
+                failures += 1
+                print(f"Failed to export {path}: {e}")
+    print(f"Exported {len(project_paths) - failures}/{len(project_paths)} models.")
+    return 1 if failures else 0
+
+
+def _parse_sizes(value):
+    try:
+        return [tuple(int(n) for n in size.lower().split("x")) for size in value.split(",") if size.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected sizes like 1000x750,4000x3000, got '{value}'")
+
+
+def run_bench(sizes, n_walls, n_curves, n_labels, repeat, seed, output=None, baseline_path=None):
+    results = bench.run_benchmarks(sizes, n_walls, n_curves, n_labels, repeat, seed)
+    if output:
+        print(f"Results written to {bench.write_results(output, results)}")
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        lines = bench.compare(results, baseline)
+        print(f"Compared with {baseline_path} ({baseline.get('commit') or 'unknown commit'}):")
+        for line in lines or ["no matching cases"]:
+            print("  " + line)
+    return 0
+
+
+def _add_profiling_arguments(parser):
+    parser.add_argument("--profile-dir", default=None,
+                        help="Write a JSON timing/memory report per input (<name>.<command>.profile.json) here")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="With --profile-dir, also dump cProfile stats per input (<name>.<command>.prof)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="floorplan", description="2D to 3D Floor Plan Converter (headless)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser("convert", help="Convert floor plan images to project JSON without the GUI")
+    convert_parser.add_argument("inputs", nargs="+", help="Image files, directories or glob patterns")
+    convert_parser.add_argument("--scale", type=float, required=True, help="Scale in PIXELS PER FOOT")
+    convert_parser.add_argument("--output", "-o", default="converted", help="Directory for the project JSON files")
+    convert_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    convert_parser.add_argument("--gpu", choices=sorted(GPU_CHOICES), default="auto",
+                                help="Prefer the GPU for OCR ('on' falls back to the CPU when it is unavailable); "
+                                     "'off' skips the GPU probe entirely")
+    convert_parser.add_argument("--ocr-model-dir", default=None,
+                                help="Directory with pre-downloaded EasyOCR models (disables downloads)")
+    convert_parser.add_argument("--tile-size", type=int, default=None,
+                                help="Detect walls in overlapping tiles of this size (pixels) on a thread pool")
+    convert_parser.add_argument("--coarse-scale", type=float, default=None,
+                                help="Downscale factor (e.g. 0.25) of a coarse pass that selects the tiles to refine")
+    convert_parser.add_argument("--cache-dir", default=None,
+                                help="Reuse OCR/wall/curve results for unchanged images from this directory")
+    convert_parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                                help="Size cap of the cache directory; least recently used entries are evicted")
+    convert_parser.add_argument("--project-format", choices=["json", "npz"], default="json",
+                                help="Write projects as JSON or in the compact binary .npz format")
+    convert_parser.add_argument("--artifacts", action="store_true",
+                                help="Also store the OCR results, preview pyramid and 3D meshes, so opening and "
+                                     "exporting the projects recomputes nothing")
+    _add_profiling_arguments(convert_parser)
+
+    export_parser = subparsers.add_parser("export", help="Write 3D models (and PNG previews) for project files, offscreen")
+    export_parser.add_argument("inputs", nargs="+", help="Project files (.json or .npz), directories or glob patterns")
+    export_parser.add_argument("--format", choices=[ext[1:] for ext in MODEL_FORMATS] + ["none"], default="gltf",
+                               help="Model file format; 'none' only renders the PNG preview")
+    export_parser.add_argument("--png", action="store_true", help="Also render a PNG preview with an off-screen plotter")
+    export_parser.add_argument("--output", "-o", default="models", help="Directory for the exported files")
+    export_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    export_parser.add_argument("--height", type=float, default=None,
+                               help="Room height in feet (default: the value stored in each project)")
+    export_parser.add_argument("--thickness", type=float, default=None,
+                               help="Wall thickness in feet (default: the value stored in each project)")
+    _add_profiling_arguments(export_parser)
+
+    bench_parser = subparsers.add_parser("bench", help="Time the pipeline stages on synthetic floor plans")
+    bench_parser.add_argument("--sizes", type=_parse_sizes, default=list(bench.DEFAULT_SIZES),
+                              help="Comma-separated plan sizes in pixels (default: 1000x750,2000x1500,4000x3000)")
+    bench_parser.add_argument("--walls", type=int, default=40, help="Walls per plan")
+    bench_parser.add_argument("--curves", type=int, default=4, help="Curved walls per plan")
+    bench_parser.add_argument("--labels", type=int, default=12, help="Room labels per plan")
+    bench_parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the best and mean are reported")
+    bench_parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic plans")
+    bench_parser.add_argument("--output", "-o", default=None, help="Write the results as JSON to this file")
+    bench_parser.add_argument("--compare", default=None, help="Print speed-ups against a previous results file")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        if args.repeat < 1 or not args.sizes:
+            parser.error("--repeat must be at least 1 and --sizes must not be empty")
+        return run_bench(args.sizes, args.walls, args.curves, args.labels, args.repeat, args.seed,
+                         args.output, args.compare)
+    if args.cprofile and not args.profile_dir:
+        parser.error("--cprofile needs --profile-dir")
+    if args.command == "convert":
+        if args.scale <= 0:
+            parser.error("--scale must be positive")
+        return convert_batch(args.inputs, args.scale, args.output, args.workers,
+                             gpu=GPU_CHOICES[args.gpu], model_dir=args.ocr_model_dir,
+                             cache_dir=args.cache_dir, cache_max_bytes=int(args.cache_max_mb * 1024 * 1024),
+                             tile_size=args.tile_size, coarse_scale=args.coarse_scale,
+                             profile_dir=args.profile_dir, cprofile=args.cprofile, project_format=args.project_format,
+                             artifacts=args.artifacts)
+    if args.command == "export":
+        if args.format == "none" and not args.png:
+            parser.error("--format none needs --png")
+        if (args.height is not None and args.height <= 0) or (args.thickness is not None and args.thickness <= 0):
+            parser.error("--height and --thickness must be positive")
+        model_format = None if args.format == "none" else "." + args.format
+        return export_batch(args.inputs, args.output, model_format, args.png, args.workers,
+                            height_ft=args.height, wall_thickness_ft=args.thickness,
+                            profile_dir=args.profile_dir, cprofile=args.cprofile)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""Room dimension strings such as ``12'6" x 10'`` or ``3.6 x 4.2 m``.
+
+One regular expression, compiled at import, finds the first "<width> x
+<length>" pair in a label in a single search. Each side is a number with an
+optional unit:
+
+- feet and inches: 12' 6", 12'-6", 12 ft 6 in, 12'
+- metric: 3.6 m, 360 cm, 3600 mm (a decimal comma, 3,6 m, is accepted too)
+- none: plain numbers are feet, except whole numbers over 40 that only make
+  sense as inches (144 x 120 -> 12' x 10')
+
+A metric unit written on one side only applies to both (3.6 x 4.2 m).
+Typographic quotes, primes and the multiplication sign are matched by the
+pattern itself, so labels are searched as they are, without a normalising
+copy. Results are in feet, together with the dim_str shown in the GUI;
+parse_many parses a batch of labels with the lookups hoisted out of the loop.
+"""
+
+import re
+
+FEET_PER_UNIT = {"m": 1 / 0.3048, "cm": 1 / 30.48, "mm": 1 / 304.8}
+MAX_PLAIN_FEET = 40 # A unitless whole number above this is read as inches ...
+PLAIN_INCH_RANGE_FT = (2, 30) # ... when that gives a room side in this range
+
+FOOT_MARKS = "'’‘`´′" # Straight and curly quotes, backtick, acute accent, prime
+INCH_MARKS = '"”“″'
+
+
+def _side(prefix):
+    # One side of the pair: number, then feet (and inches) or a metric unit, both optional
+    feet = rf"[{FOOT_MARKS}]|(?i:ft\b\.?|feet\b)"
+    inches = rf"[{INCH_MARKS}]|''|(?i:in\b\.?)"
+    return (rf"(?P<{prefix}>\d+(?:[.,]\d+)?)\s*"
+            rf"(?:(?P<{prefix}_ft>{feet})\s*-?\s*(?:(?P<{prefix}_in>\d{{1,2}}(?:\.\d+)?)\s*(?:{inches}))?"
+            rf"|(?P<{prefix}_unit>(?i:mm|cm|m))(?![a-zA-Z]))?")
+
+
+DIMENSION_PATTERN = re.compile(_side("w") + r"\s*[xX×*]\s*" + _side("l"))
+
+
+def _number(text):
+    return float(text.replace(",", "."))
+
+
+def _feet(value, inches):
+    return value + (_number(inches) / 12.0 if inches else 0.0)
+
+
+def _plain_feet(value):
+    # Unitless whole numbers too large for feet are taken as inches when that gives a plausible size
+    if value > MAX_PLAIN_FEET and value % 1 == 0 and PLAIN_INCH_RANGE_FT[0] < value / 12.0 < PLAIN_INCH_RANGE_FT[1]:
+        return value / 12.0
+    return value
+
+
+def parse_dimensions(text):
+    """(width_ft, length_ft, dim_str) for the first dimension pair in text, or None."""
+    return _from_match(DIMENSION_PATTERN.search(text))
+
+
+def _from_match(match):
+    if match is None: return None
+    width, length = _number(match["w"]), _number(match["l"])
+    unit = (match["w_unit"] or match["l_unit"] or "").lower()
+    if unit:
+        width_ft, length_ft = width * FEET_PER_UNIT[unit], length * FEET_PER_UNIT[unit]
+    elif match["w_ft"] or match["l_ft"]:
+        width_ft, length_ft = _feet(width, match["w_in"]), _feet(length, match["l_in"])
+    else:
+        width_ft, length_ft = _plain_feet(width), _plain_feet(length)
+    return width_ft, length_ft, f"{width_ft:.1f}' x {length_ft:.1f}'"
+
+
+def parse_many(texts):
+    """parse_dimensions for every text, in order."""
+    search = DIMENSION_PATTERN.search
+    return [_from_match(search(text)) for text in texts]
@@ -0,0 +1,666 @@
+"""GUI-free floor plan detection engine.
+
+Everything here works on plain NumPy images and dicts, so it can be imported
+by batch workers and services without pulling in Tkinter, PyVista or EasyOCR.
+"""
+
+import copy
+import hashlib
+import json
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+
+from floorplan.dimensions import parse_dimensions
+from floorplan.openings import detect_openings
+from floorplan.preprocess import adaptive_threshold, preprocess
+from floorplan.profiling import Profile, timed
+from floorplan.rooms import assign_rooms, segment_rooms
+from floorplan.spatial import build_plan_index
+from floorplan.textgroups import group_text
+
+# Attempt to import ximgproc for thinning, will be handled if not available
+try:
+    from cv2 import ximgproc
+    XIMGPROC_AVAILABLE = True
+except ImportError:
+    XIMGPROC_AVAILABLE = False
+    print("Warning: cv2.ximgproc not available. Skeletonization will be skipped. Consider installing 'opencv-contrib-python'.")
+
+
+DETECTION_VERSION = 1 # Bump when detection output changes, so cached results are not reused
+MASK_MIN_CONFIDENCE = 0.3
+# Larger images run the wall and curved wall detectors one after the other: side by side, their working buffers
+# add up (an 8000 x 6000 plan peaked about 150 MB higher), which costs more than the overlap saves
+CONCURRENT_DETECTION_MAX_PIXELS = 12_000_000
+
+
+class AnalysisCancelled(Exception):
+    """Raised by analyze when its cancel_event is set; checked between stages."""
+
+
+def _check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise AnalysisCancelled()
+
+
+@dataclass
+class PlanResult:
+    walls: list = field(default_factory=list)
+    curved_walls: list = field(default_factory=list)
+    room_dimensions: dict = field(default_factory=dict)
+    room_positions: dict = field(default_factory=dict)
+    scale_factor: float = 1.0
+    ocr_results: list = field(default_factory=list) # [(bbox_points, text, confidence), ...]
+    ocr_error: str = None # Set when the reader failed; the plan was then analysed without text
+    timings: dict = field(default_factory=dict) # stage name -> seconds
+    profile: Profile = None # Timings plus call counts and memory per stage; profile.timings is timings
+
+
+def _line_params(segments):
+    # Hessian normal form (rho, theta) of every segment, theta in [0, pi), rho through the midpoint
+    x1, y1, x2, y2 = segments.T
+    theta = np.arctan2(y2 - y1, x2 - x1)
+    theta[theta < 0] += np.pi
+    theta[theta >= np.pi] -= np.pi
+    rho = (x1 + x2) / 2 * np.cos(theta) + (y1 + y2) / 2 * np.sin(theta)
+    return theta, rho
+
+
+def _last_close_predecessor(segments, run_ids, radius_px):
+    # For each segment i, the largest j < i in the same run with an endpoint closer than radius_px
+    # to one of i's endpoints (-1 if none). Endpoints are bucketed on a uniform grid of cell size
+    # radius_px, so only the 3x3 neighbouring cells of each endpoint are compared.
+    n = len(segments)
+    last_close = np.full(n, -1, dtype=np.int64)
+    points = segments.reshape(-1, 2)
+    owners = np.repeat(np.arange(n), 2)
+    cells = np.floor_divide(points, radius_px)
+    cells -= cells.min(axis=0) - 1 # Keep a one-cell border so neighbour offsets never wrap
+    n_cols, n_rows = cells.max(axis=0) + 2
+    keys = (np.repeat(run_ids, 2) * n_cols + cells[:, 0]) * n_rows + cells[:, 1]
+
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    for off_x in (-1, 0, 1):
+        for off_y in (-1, 0, 1):
+            targets = keys + off_x * n_rows + off_y
+            lo = np.searchsorted(sorted_keys, targets, side="left")
+            counts = np.searchsorted(sorted_keys, targets, side="right") - lo
+            total = counts.sum()
+            if total == 0: continue
+            a = np.repeat(np.arange(len(points)), counts)
+            b = order[np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(total)]
+            owner_a, owner_b = owners[a], owners[b]
+            diff = points[a] - points[b]
+            close = (owner_b < owner_a) & ((diff * diff).sum(axis=1) < radius_px * radius_px)
+            np.maximum.at(last_close, owner_a[close], owner_b[close])
+    return last_close
+
+
+def _farthest_pair(points, direction):
+    # Exact farthest pair of a near-collinear point set. Only points near the two ends of the
+    # projection onto `direction` can be part of it, so the pairwise search runs on those few.
+    # Ties resolve to the lowest (j, k) index pair, like a j < k brute-force scan.
+    u = np.array([np.cos(direction), np.sin(direction)])
+    v = np.array([-u[1], u[0]])
+    p = points @ u
+    q = points @ v
+    extent = p.max() - p.min()
+    spread = q.max() - q.min()
+    slack = extent - math.sqrt(max(extent * extent - spread * spread, 0.0)) + 1e-6 * (1.0 + extent)
+    candidates = np.flatnonzero((p <= p.min() + slack) | (p >= p.max() - slack))
+    cand_points = points[candidates]
+    diff = cand_points[:, None, :] - cand_points[None, :, :]
+    dist_sq = (diff * diff).sum(axis=2)
+    dist_sq[np.tril_indices(len(candidates))] = -1
+    j, k = np.unravel_index(np.argmax(dist_sq), dist_sq.shape)
+    return points[candidates[j]], points[candidates[k]]
+
+
+def merge_lines(lines, angle_threshold_deg=5, dist_threshold_px=20):
+    # Segments are sorted by (theta, rho) and grouped greedily: a segment joins the current group
+    # when it is within the angle/rho thresholds of the previous one and one of its endpoints lies
+    # within 2 * dist_threshold_px of an endpoint already in the group. Each group becomes the
+    # segment between its two farthest endpoints.
+    if lines is None or len(lines) == 0:
+        return []
+
+    segments = np.asarray(lines).reshape(-1, 4).astype(np.int64)
+    segments = segments[(segments[:, 0] != segments[:, 2]) | (segments[:, 1] != segments[:, 3])] # Skip zero-length segments
+    if len(segments) == 0: return []
+
+    theta, rho = _line_params(segments)
+    order = np.lexsort((rho, theta))
+    segments, theta, rho = segments[order], theta[order], rho[order]
+    n = len(segments)
+
+    # Angle/rho test between consecutive segments (handles wrap-around: 1deg and 179deg are similar)
+    delta_theta_deg = np.degrees(np.abs(np.diff(theta)))
+    delta_theta_deg = np.where(delta_theta_deg > 90, 180 - delta_theta_deg, delta_theta_deg)
+    similar_to_prev = (delta_theta_deg < angle_threshold_deg) & (np.abs(np.diff(rho)) < dist_threshold_px)
+    run_ids = np.concatenate(([0], np.cumsum(~similar_to_prev)))
+    last_close = _last_close_predecessor(segments, run_ids, dist_threshold_px * 2)
+
+    group_starts = [0]
+    similar_list = similar_to_prev.tolist()
+    last_close_list = last_close.tolist()
+    for i in range(1, n):
+        if not (similar_list[i - 1] and last_close_list[i] >= group_starts[-1]):
+            group_starts.append(i)
+    group_ends = group_starts[1:] + [n]
+
+    final_merged_segments = []
+    for start, end in zip(group_starts, group_ends):
+        if end - start == 1:
+            final_merged_segments.append(segments[start:end].astype(np.int32))
+            continue
+        p_start, p_end = _farthest_pair(segments[start:end].reshape(-1, 2), theta[start])
+        final_merged_segments.append(np.array([[p_start[0], p_start[1], p_end[0], p_end[1]]], dtype=np.int32))
+    return final_merged_segments
+
+
+def _wall_hough_segments(blurred, profile=None):
+    # Threshold, morphology, Canny and HoughLinesP on the blurred grayscale image (or one tile of it);
+    # intermediates are dropped as soon as they are used, so at most three full-size buffers are alive at once
+
+    # Adaptive Thresholding (walls become white, background black)
+    # blockSize must be odd and >1. C is a constant subtracted from mean/weighted sum.
+    # Fine-tune blockSize and C based on line thickness and contrast.
+    with timed(profile, "detect_walls/threshold"):
+        binarized = adaptive_threshold(blurred, 21, 7) # Tunable
+    # cv2.imwrite("debug_walls_adaptive_thresh.png", binarized)
+
+    # Morphological Operations
+    # Kernel for closing: A bit larger to connect slightly broken wall lines
+    with timed(profile, "detect_walls/morphology"):
+        kernel_close = cv2.getStructuringElement(cv2.MORPH_RECT, (5,1)) # Rectangular kernel, more horizontal
+        closed_img = cv2.morphologyEx(binarized, cv2.MORPH_CLOSE, kernel_close, iterations=1)
+        kernel_close = cv2.getStructuringElement(cv2.MORPH_RECT, (1,5)) # Rectangular kernel, more vertical
+        closed_v = cv2.morphologyEx(binarized, cv2.MORPH_CLOSE, kernel_close, iterations=1)
+        del binarized
+        cv2.bitwise_or(closed_img, closed_v, dst=closed_img) # Combine horizontal and vertical closing
+        del closed_v
+
+        # Kernel for opening: Smaller to remove noise without eroding walls too much
+        kernel_open = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        opened_img = cv2.morphologyEx(closed_img, cv2.MORPH_OPEN, kernel_open, iterations=1)
+        del closed_img
+    # cv2.imwrite("debug_walls_morph.png", opened_img)
+    
+    # Canny Edge Detection
+    # Lower thresholds make it more sensitive. Higher thresholds are stricter.
+    low_canny = 50  # Tunable
+    high_canny = 150 # Tunable
+    with timed(profile, "detect_walls/canny"):
+        edges = cv2.Canny(opened_img, low_canny, high_canny, apertureSize=3)
+    del opened_img
+    # cv2.imwrite("debug_walls_canny_edges.png", edges)
+
+    # HoughLinesP Transform
+    # threshold: Min number of votes (intersections in Hough space)
+    # minLineLength: Min length of a line in pixels.
+    # maxLineGap: Max allowed gap between points on the same line to link them.
+    with timed(profile, "detect_walls/hough"):
+        lines = cv2.HoughLinesP(
+            edges, rho=1, theta=np.pi / 180,
+            threshold=30,       # Tunable (e.g., 20-50)
+            minLineLength=20,   # Tunable (e.g., 15-50 pixels)
+            maxLineGap=10       # Tunable (e.g., 5-20 pixels)
+        )
+    return lines
+
+
+def detect_walls(image_cv, tile_size=None, tile_overlap_px=None, coarse_scale=None, max_workers=None, profile=None):
+    # tile_size enables tiled detection (overlapping tiles on a thread pool, segments stitched at the seams);
+    # coarse_scale (e.g. 0.25) adds a downscaled pass that picks which tiles are refined at full resolution.
+    # With tiles, the sub-step timings in profile are summed over all tiles (CPU time across threads).
+    # image_cv may be a floorplan.preprocess.Preprocessed shared with the other detectors.
+    if image_cv is None:
+        print("Error: Received None image in detect_walls")
+        return []
+    blurred = preprocess(image_cv, profile).blurred
+
+    if tile_size or coarse_scale:
+        from floorplan.tiling import DEFAULT_TILE_OVERLAP_PX, tiled_segments
+        lines = tiled_segments(blurred, lambda tile: _wall_hough_segments(tile, profile), tile_size,
+                               overlap_px=tile_overlap_px or DEFAULT_TILE_OVERLAP_PX,
+                               coarse_scale=coarse_scale, max_workers=max_workers)
+    else:
+        lines = _wall_hough_segments(blurred, profile)
+
+    if lines is None:
+        print("No lines detected by HoughP.")
+        return []
+        
+    # Merge fragmented lines from HoughP
+    # Angle threshold in degrees, distance threshold in pixels for grouping
+    with timed(profile, "detect_walls/merge"):
+        merged_hough_lines = merge_lines(lines, angle_threshold_deg=7, dist_threshold_px=25) # Tunable
+
+    detected_walls = []
+    min_final_wall_length = 25 # Minimum length for a wall after merging
+    angle_tolerance_deg_hv = 8 # Stricter tolerance for Horizontal/Vertical
+
+    for line_segment in merged_hough_lines:
+        x1, y1, x2, y2 = line_segment[0]
+        length = np.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+        
+        if length < min_final_wall_length: continue
+
+        angle_rad = np.arctan2(y2 - y1, x2 - x1)
+        angle_deg = np.degrees(angle_rad)
+        
+        is_horizontal = (abs(angle_deg) < angle_tolerance_deg_hv or 
+                         abs(abs(angle_deg) - 180.0) < angle_tolerance_deg_hv)
+        is_vertical = (abs(abs(angle_deg) - 90.0) < angle_tolerance_deg_hv)
+                           
+        if is_horizontal: wall_type = "horizontal"
+        elif is_vertical: wall_type = "vertical"
+        else: continue # Skip diagonal lines for now, or assign "diagonal"
+        
+        detected_walls.append({
+            "start": (int(x1), int(y1)), "end": (int(x2), int(y2)), 
+            "type": wall_type, "length": length, "openings": [] 
+        })
+    
+    print(f"Detected {len(detected_walls)} wall candidates after HoughP and merging.")
+    return detected_walls
+
+
+def detect_curved_walls(image_cv, profile=None):
+    # image_cv may be a floorplan.preprocess.Preprocessed shared with the other detectors
+    if image_cv is None: return []
+    blurred = preprocess(image_cv, profile).blurred
+
+    with timed(profile, "detect_curved_walls/threshold"):
+        binarized = adaptive_threshold(blurred, 11, 3)
+
+    with timed(profile, "detect_curved_walls/morphology"):
+        kernel_close = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (7, 7)) 
+        closed_img = cv2.morphologyEx(binarized, cv2.MORPH_CLOSE, kernel_close, iterations=2)
+        del binarized
+    
+        kernel_open = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        opened_img = cv2.morphologyEx(closed_img, cv2.MORPH_OPEN, kernel_open, iterations=1) 
+        del closed_img
+
+    image_for_contours = opened_img
+    if XIMGPROC_AVAILABLE:
+        try:
+            with timed(profile, "detect_curved_walls/thinning"):
+                thinned = ximgproc.thinning(opened_img)
+            image_for_contours = thinned
+        except Exception as e:
+            print(f"Error during thinning for curves: {e}. Using morphed image.")
+
+    with timed(profile, "detect_curved_walls/contours"):
+        contours, _ = cv2.findContours(image_for_contours, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    curved_walls_detected = []
+    
+    min_contour_length_pixels = 30 
+    min_points_for_curve_approx = 4 
+    min_contour_area_heuristic = 40
+
+    for contour in contours:
+        length = cv2.arcLength(contour, False) 
+        if length < min_contour_length_pixels or cv2.contourArea(contour) < min_contour_area_heuristic:
+            continue
+        
+        epsilon_factor = 0.01 
+        epsilon = epsilon_factor * length 
+        approx = cv2.approxPolyDP(contour, epsilon, False) 
+        
+        if len(approx) >= min_points_for_curve_approx:
+            curved_walls_detected.append({
+                "points": [(int(p[0][0]), int(p[0][1])) for p in approx], "length": length, "openings": [] })
+    print(f"Detected {len(curved_walls_detected)} curved wall candidates.")
+    return curved_walls_detected
+
+
+def detect_geometry(image_cv, walls=True, curved_walls=True, tile_size=None, coarse_scale=None, profile=None):
+    """(walls, curved_walls) from one image, either left as None when not asked for.
+
+    Both detectors share one floorplan.preprocess.Preprocessed (grayscale and median blur are computed once).
+    Up to CONCURRENT_DETECTION_MAX_PIXELS they run concurrently on two threads, OpenCV releasing the GIL for the
+    heavy steps, and each is timed as its own stage in profile, so their times overlap; larger images run them
+    in turn to bound peak memory. The blurred image is released afterwards.
+    """
+    prepared = preprocess(image_cv, profile)
+
+    def run_walls():
+        with timed(profile, "detect_walls"):
+            return detect_walls(prepared, tile_size=tile_size, coarse_scale=coarse_scale, profile=profile)
+
+    def run_curves():
+        with timed(profile, "detect_curved_walls"):
+            return detect_curved_walls(prepared, profile)
+
+    try:
+        if not (walls and curved_walls) or prepared.shape[0] * prepared.shape[1] > CONCURRENT_DETECTION_MAX_PIXELS:
+            return (run_walls() if walls else None), (run_curves() if curved_walls else None)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            curves_future = pool.submit(run_curves)
+            walls_result = run_walls()
+            return walls_result, curves_future.result()
+    finally:
+        prepared.release_blurred()
+
+
+def run_ocr(image_cv, reader):
+    # Single OCR pass per image; the results feed both text masking and room extraction. Reader errors propagate
+    easyocr_results = reader.readtext(image_cv, detail=1, paragraph=False)
+    return [([[int(x), int(y)] for x, y in bbox], text, float(prob)) for bbox, text, prob in easyocr_results]
+
+
+def mask_text(image_cv, ocr_results, min_confidence=MASK_MIN_CONFIDENCE, padding_px=5):
+    # Paints OCR boxes white in place so text strokes are not detected as walls
+    for (bbox, text, prob) in ocr_results:
+        if prob < min_confidence: continue 
+        points = np.array(bbox, dtype=np.int32)
+        rect_x_min = np.min(points[:, 0]) - padding_px 
+        rect_y_min = np.min(points[:, 1]) - padding_px
+        rect_x_max = np.max(points[:, 0]) + padding_px
+        rect_y_max = np.max(points[:, 1]) + padding_px
+        cv2.rectangle(image_cv, 
+                      (int(rect_x_min), int(rect_y_min)), (int(rect_x_max), int(rect_y_max)), 
+                      (255, 255, 255), -1) 
+    return image_cv
+
+
+def extract_room_descriptions(ocr_results, room_dimensions, room_positions, scale_factor, profile=None):
+    # Updates room_dimensions / room_positions in place, like the GUI state it used to live on
+    all_text_detections = []
+    for (bbox, text, prob) in ocr_results:
+        if prob < 0.4: continue 
+        points = np.array(bbox, dtype=np.int32)
+        all_text_detections.append({
+            "text": text, 
+            "center_x_px": np.mean(points[:, 0]), "center_y_px": np.mean(points[:, 1]),
+            "min_x_px": np.min(points[:, 0]), "max_x_px": np.max(points[:, 0]),
+            "min_y_px": np.min(points[:, 1]), "max_y_px": np.max(points[:, 1]),
+            "bbox_pixels": points.tolist() 
+        })
+
+    processed_detection_indices = set() 
+    # Selections only look at the text boxes in their own grid cells instead of every detection
+    text_index = build_plan_index(text_detections=all_text_detections) if all_text_detections else None
+
+    temp_room_dimensions = room_dimensions.copy() 
+    for room_name, room_data in temp_room_dimensions.items():
+        if "pixel_bounds" in room_data and room_data.get("dim_str") == "To be OCR'd": 
+            sel_min_x, sel_min_y, sel_max_x, sel_max_y = room_data["pixel_bounds"]
+            
+            best_match_ocr = None
+            min_dist_to_sel_center = float('inf')
+            sel_center_x = (sel_min_x + sel_max_x) / 2
+            sel_center_y = (sel_min_y + sel_max_y) / 2
+            best_match_idx = -1 
+
+            candidates = text_index.text_in_rect((sel_min_x, sel_min_y, sel_max_x, sel_max_y)) if text_index else []
+            for idx in candidates:
+                if idx in processed_detection_indices: continue
+                detection = all_text_detections[idx]
+                
+                ocr_box_center_x, ocr_box_center_y = detection["center_x_px"], detection["center_y_px"]
+                if (sel_min_x <= ocr_box_center_x <= sel_max_x and
+                    sel_min_y <= ocr_box_center_y <= sel_max_y):
+                    
+                    dist = math.sqrt((ocr_box_center_x - sel_center_x)**2 + (ocr_box_center_y - sel_center_y)**2)
+                    if dist < min_dist_to_sel_center:
+                        min_dist_to_sel_center = dist
+                        best_match_ocr = detection
+                        best_match_idx = idx 
+            
+            if best_match_ocr and best_match_idx != -1: 
+                parsed = parse_room_text(best_match_ocr["text"])
+                if parsed:
+                    width_ft, length_ft, dim_str = parsed
+                    current_scale = scale_factor if scale_factor > 0 else 1.0
+
+                    room_dimensions[room_name].update({
+                        "width": width_ft, "length": length_ft, "dim_str": dim_str,
+                        "area": width_ft * length_ft,
+                        "position": (best_match_ocr["center_x_px"] / current_scale, 
+                                     best_match_ocr["center_y_px"] / current_scale),
+                        "ocr_bbox_center_pixels": (best_match_ocr["center_x_px"], best_match_ocr["center_y_px"])
+                    })
+                    if room_name in room_positions:
+                         room_positions[room_name].update({
+                            "center_x": best_match_ocr["center_x_px"] / current_scale, 
+                            "center_y": best_match_ocr["center_y_px"] / current_scale,
+                            "min_x": (best_match_ocr["center_x_px"] / current_scale) - (width_ft / 2), 
+                            "max_x": (best_match_ocr["center_x_px"] / current_scale) + (width_ft / 2), 
+                            "min_y": (best_match_ocr["center_y_px"] / current_scale) - (length_ft / 2), 
+                            "max_y": (best_match_ocr["center_y_px"] / current_scale) + (length_ft / 2)
+                        })
+                    processed_detection_indices.add(best_match_idx)
+    
+    unprocessed_text_detections = [
+        det for i, det in enumerate(all_text_detections) if i not in processed_detection_indices
+    ]
+
+    # Rooms read from these labels on an earlier pass, by label position, so processing again updates them
+    rooms_by_label = {_label_key(data["ocr_bbox_center_pixels"]): name for name, data in room_dimensions.items()
+                      if data.get("ocr_bbox_center_pixels") is not None}
+
+    if unprocessed_text_detections:
+        with timed(profile, "extract_room_descriptions/group_text"):
+            text_groups = group_text(unprocessed_text_detections)
+        for group in text_groups:
+            cluster_elements = [unprocessed_text_detections[j] for j in group] # Already in reading order
+            full_cluster_text = " ".join([elem["text"] for elem in cluster_elements])
+            
+            avg_cluster_center_x_px = np.mean([elem["center_x_px"] for elem in cluster_elements])
+            avg_cluster_center_y_px = np.mean([elem["center_y_px"] for elem in cluster_elements])
+            
+            parsed_dims = parse_room_text(full_cluster_text)
+            if parsed_dims:
+                width_ft, length_ft, dim_str = parsed_dims
+                room_name_from_text = "Room"; 
+                
+                name_match = re.search(r'\b(kitchen|bath(?:room)?|bed(?:room)?|living|dining|office|hallway|garage|closet|study|room|master|guest|play|nook|den|pantry|foyer|laundry)\b', full_cluster_text.lower(), re.IGNORECASE)
+                if name_match:
+                    room_name_from_text = name_match.group(1).capitalize()
+                else: 
+                    candidate_name = re.sub(r'[^a-zA-Z0-9\s]', '', full_cluster_text).strip()
+                    candidate_name_parts = candidate_name.split()
+                    if candidate_name_parts:
+                        room_name_from_text = " ".join(candidate_name_parts[:2]).title() if len(candidate_name_parts) >1 else candidate_name_parts[0].title()
+                    if not room_name_from_text : room_name_from_text = "Area"
+
+                current_scale = scale_factor if scale_factor > 0 else 1.0
+                pos_x_ft = avg_cluster_center_x_px / current_scale
+                pos_y_ft = avg_cluster_center_y_px / current_scale
+                entry = {
+                    "width": width_ft, "length": length_ft, "dim_str": dim_str, "area": width_ft * length_ft,
+                    "position": (pos_x_ft, pos_y_ft),
+                    "ocr_bbox_center_pixels": (avg_cluster_center_x_px, avg_cluster_center_y_px)
+                }
+
+                final_room_name = rooms_by_label.get(_label_key((avg_cluster_center_x_px, avg_cluster_center_y_px)))
+                if final_room_name is not None:
+                    room_dimensions[final_room_name].update(entry) # Keeps its name, type and polygon
+                else:
+                    counter = 1; final_room_name = room_name_from_text
+                    while final_room_name in room_dimensions: 
+                        counter += 1; final_room_name = f"{room_name_from_text} {counter}"
+                    room_dimensions[final_room_name] = {**entry, "type": determine_room_type(final_room_name)}
+                room_positions[final_room_name] = {
+                    "center_x": pos_x_ft, "center_y": pos_y_ft,
+                    "min_x": pos_x_ft - width_ft / 2, "max_x": pos_x_ft + width_ft / 2, 
+                    "min_y": pos_y_ft - length_ft / 2, "max_y": pos_y_ft + length_ft / 2 
+                }
+
+
+def _label_key(center_px):
+    # Label centres are means of whole-pixel boxes; rounding keeps them equal after a JSON round trip
+    return (round(float(center_px[0]), 1), round(float(center_px[1]), 1))
+
+
+def parse_room_text(text):
+    # (width_ft, length_ft, dim_str) or None; see floorplan.dimensions for the accepted formats
+    return parse_dimensions(text)
+
+
+def determine_room_type(room_name):
+    room_name_lower = room_name.lower()
+    if "bed" in room_name_lower: return "Bedroom"
+    if "kitch" in room_name_lower: return "Kitchen"
+    if "living" in room_name_lower: return "Living Room"
+    if "bath" in room_name_lower: return "Bathroom"
+    if "dining" in room_name_lower: return "Dining Room"
+    if "office" in room_name_lower: return "Office"
+    if "hall" in room_name_lower: return "Other" 
+    return "Other"
+
+
+def _cache_get(cache, digest, stage, params, restore):
+    if cache is None:
+        return None
+    cached = cache.get(digest, stage, params)
+    return restore(cached) if cached is not None else None
+
+
+def _cache_put(cache, digest, stage, params, value):
+    # Stored right away, before detect_openings and friends mutate the value
+    if cache is not None and value is not None:
+        cache.put(digest, stage, params, value)
+
+
+def _restore_ocr_results(cached):
+    return [(bbox, text, prob) for bbox, text, prob in cached]
+
+
+def _restore_walls(cached):
+    for wall in cached:
+        wall["start"] = tuple(wall["start"]); wall["end"] = tuple(wall["end"])
+    return cached
+
+
+def _restore_curved_walls(cached):
+    for curve in cached:
+        curve["points"] = [tuple(p) for p in curve["points"]]
+    return cached
+
+
+def analyze(image_cv, scale_factor, reader=None, room_dimensions=None, room_positions=None, report_status=print,
+            cache=None, tile_size=None, coarse_scale=None, inplace=False, cancel_event=None, profile=None,
+            ocr_results=None):
+    """Run the full detection pipeline on a grayscale or BGR image.
+
+    reader is an EasyOCR-compatible object (anything with readtext); without it
+    text masking and room extraction are skipped. OCR runs once and its results
+    are shared by the masking and room extraction stages. ocr_results, e.g.
+    stored in a project, are used instead of running OCR (no reader needed). With a
+    floorplan.cache.DetectionCache, the OCR, wall and curved wall stages are
+    reused for identical pixels and parameters. Walls and curved walls are
+    detected concurrently from one shared preprocessing pass (detect_geometry),
+    which the opening detection reuses. tile_size / coarse_scale switch
+    wall detection to the tiled / coarse-to-fine mode for very large scans
+    (see floorplan.tiling). With inplace=True, OCR text is masked directly in
+    image_cv instead of in a full-size copy. cancel_event (e.g. a
+    threading.Event) is checked between stages; once it is set, analyze raises
+    AnalysisCancelled. Pass a floorplan.profiling.Profile to collect stages
+    recorded by the caller (e.g. image decode) in the same report; one is
+    created otherwise. A failing reader does not raise: its message is kept in
+    PlanResult.ocr_error and the plan is analysed without text. Existing room_dimensions /
+    room_positions (e.g. manual selections waiting for OCR) are copied, updated
+    and returned in the PlanResult, together with per-stage timings in seconds.
+    """
+    result = PlanResult(room_dimensions=copy.deepcopy(room_dimensions or {}),
+                        room_positions=copy.deepcopy(room_positions or {}),
+                        scale_factor=scale_factor, profile=profile or Profile())
+    result.timings = result.profile.timings
+    profile = result.profile
+    digest = None
+    if cache is not None:
+        from floorplan.cache import image_digest
+        with timed(profile, "image_hash"):
+            digest = image_digest(image_cv)
+
+    ocr_params = None
+    _check_cancelled(cancel_event)
+    if ocr_results is not None:
+        result.ocr_results = _restore_ocr_results(ocr_results)
+        # The geometry cache entries depend on what was masked, so they are keyed by these results
+        ocr_text = json.dumps(result.ocr_results, default=lambda value: np.asarray(value).tolist())
+        ocr_params = {"version": DETECTION_VERSION, "results": hashlib.sha1(ocr_text.encode("utf-8")).hexdigest()}
+    elif reader:
+        ocr_params = {"version": DETECTION_VERSION, "languages": list(getattr(reader, "lang_list", None) or [])}
+        with timed(profile, "ocr"):
+            result.ocr_results = _cache_get(cache, digest, "ocr", ocr_params, _restore_ocr_results)
+            if result.ocr_results is None:
+                report_status("Performing OCR...")
+                try:
+                    result.ocr_results = run_ocr(image_cv, reader)
+                except Exception as e:
+                    # The geometry is still worth having; callers decide what a failed OCR pass means
+                    print(f"EasyOCR error: {e}")
+                    result.ocr_error = str(e) or type(e).__name__
+                _cache_put(cache, digest, "ocr", ocr_params, result.ocr_results)
+        result.ocr_results = result.ocr_results or []
+        _check_cancelled(cancel_event)
+
+    geometry_params = {"version": DETECTION_VERSION, "ocr": ocr_params, "mask_min_confidence": MASK_MIN_CONFIDENCE,
+                       "tile_size": tile_size, "coarse_scale": coarse_scale}
+    walls = _cache_get(cache, digest, "walls", geometry_params, _restore_walls)
+    curved_walls = _cache_get(cache, digest, "curved_walls", geometry_params, _restore_curved_walls)
+    prepared = None
+
+    def masked_image():
+        # Text-masked and preprocessed once, for the detectors and the opening detection alike, so a cache hit
+        # detects openings on exactly the pixels a miss does. OCR and the cache digest used the original pixels
+        nonlocal prepared
+        if prepared is None:
+            image = image_cv if inplace else image_cv.copy()
+            if result.ocr_results:
+                with timed(profile, "text_masking"):
+                    mask_text(image, result.ocr_results)
+            prepared = preprocess(image, profile)
+        return prepared
+
+    if walls is None or curved_walls is None:
+        report_status("Detecting walls and curves...")
+        masked_image()
+        _check_cancelled(cancel_event)
+        new_walls, new_curved_walls = detect_geometry(prepared, walls is None, curved_walls is None, tile_size,
+                                                      coarse_scale, profile)
+        if walls is None:
+            walls = new_walls
+            _cache_put(cache, digest, "walls", geometry_params, walls)
+        if curved_walls is None:
+            curved_walls = new_curved_walls
+            _cache_put(cache, digest, "curved_walls", geometry_params, curved_walls)
+    else:
+        report_status("Using cached walls and curves...")
+    result.curved_walls = curved_walls
+    _check_cancelled(cancel_event)
+    report_status("Detecting doors and windows...")
+    with timed(profile, "detect_openings"):
+        result.walls = detect_openings(masked_image(), walls, scale_factor)
+
+    _check_cancelled(cancel_event)
+    if reader or ocr_results is not None:
+        report_status("Extracting room descriptions...")
+        with timed(profile, "extract_room_descriptions"):
+            extract_room_descriptions(result.ocr_results, result.room_dimensions, result.room_positions, scale_factor,
+                                      profile)
+    else:
+        report_status("EasyOCR not available. Skipping text extraction.")
+
+    _check_cancelled(cancel_event)
+    report_status("Segmenting rooms...")
+    with timed(profile, "segment_rooms"):
+        segmented_rooms = segment_rooms(result.walls, result.curved_walls, image_cv.shape, scale_factor)
+        assign_rooms(result.room_dimensions, result.room_positions, segmented_rooms, scale_factor)
+    return result
+
+
+def format_timings(timings):
+    # Top-level stages only; sub-steps ("detect_walls/hough") are in the profiling report
+    return ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items() if "/" not in stage)
@@ -0,0 +1,122 @@
+"""Headless export of the 3D model: glTF/OBJ/STL/PLY files and PNG previews.
+
+Nothing here opens a window. glTF and OBJ go through VTK's scene exporters on
+an off-screen plotter, so each material keeps its colour and opacity (OBJ
+writes a .mtl file next to the .obj). STL and PLY are written from a single
+combined mesh without any rendering; PLY carries per-cell RGBA colours, STL
+only geometry. PNG previews need an off-screen OpenGL context (EGL or OSMesa
+builds of VTK on machines without a display).
+"""
+
+import os
+
+import numpy as np
+
+from floorplan.profiling import timed
+from floorplan.project import DEFAULT_HEIGHT, DEFAULT_WALL_THICKNESS, load_artifacts
+from floorplan.scene import DEFAULT_MATERIALS, StoredScene, build_scene, scene_key
+
+MODEL_FORMATS = (".gltf", ".obj", ".stl", ".ply")
+PNG_WINDOW_SIZE = (1000, 800)
+BACKGROUND_COLOR = "#F0F0F0"
+
+
+def frame_model(plotter):
+    # Same isometric view as the GUI's model window
+    plotter.camera_position = 'iso'
+    plotter.camera.elevation = 35
+    plotter.camera.azimuth = -45
+    plotter.camera.zoom(1.2)
+    plotter.enable_parallel_projection()
+
+
+def _offscreen_plotter(model_scene, window_size=PNG_WINDOW_SIZE):
+    import pyvista as pv
+    plotter = pv.Plotter(off_screen=True, window_size=list(window_size), lighting='three lights')
+    plotter.background_color = BACKGROUND_COLOR
+    model_scene.add_to_plotter(plotter)
+    return plotter
+
+
+def combined_mesh(model_scene):
+    """All materials in one PolyData with an RGBA uint8 cell array named "colors"."""
+    import pyvista as pv
+    meshes = []
+    for mesh, color, opacity in model_scene.to_polydata():
+        rgba = list(pv.Color(color).int_rgb) + [int(round(opacity * 255))]
+        mesh.cell_data["colors"] = np.tile(np.array(rgba, dtype=np.uint8), (mesh.n_cells, 1))
+        meshes.append(mesh)
+    if not meshes:
+        return pv.PolyData()
+    return meshes[0].append_polydata(*meshes[1:]) if len(meshes) > 1 else meshes[0]
+
+
+def export_model(model_scene, path):
+    """Write the scene to path; the format follows the extension (see MODEL_FORMATS)."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in MODEL_FORMATS:
+        raise ValueError(f"Unsupported model format '{extension}', expected one of {', '.join(MODEL_FORMATS)}")
+    if extension in (".gltf", ".obj"):
+        plotter = _offscreen_plotter(model_scene)
+        try:
+            if extension == ".gltf":
+                plotter.export_gltf(path)
+            else:
+                plotter.export_obj(path)
+        finally:
+            plotter.close()
+        return path
+
+    mesh = combined_mesh(model_scene).triangulate()
+    if extension == ".ply":
+        mesh.save(path, texture="colors")
+    else:
+        mesh.save(path)
+    return path
+
+
+def render_png(model_scene, path, window_size=PNG_WINDOW_SIZE):
+    plotter = _offscreen_plotter(model_scene, window_size)
+    try:
+        frame_model(plotter)
+        plotter.screenshot(path)
+    finally:
+        plotter.close()
+    return path
+
+
+def project_scene(project_data, height_ft, wall_thickness_ft, project_path=None, materials=None, profile=None):
+    """The scene of a loaded project: its stored meshes (see floorplan.project) when project_path has meshes built
+    from the same inputs, else built now. Either way a StoredScene whose key identifies the inputs."""
+    inputs = (project_data.get("walls", []), project_data.get("curved_walls", []),
+              project_data.get("room_dimensions", {}), project_data.get("scale_factor", 1.0), height_ft,
+              wall_thickness_ft, materials or DEFAULT_MATERIALS)
+    with timed(profile, "scene/key"):
+        key = scene_key(*inputs)
+    if project_path:
+        with timed(profile, "scene/load_stored"):
+            # Only the header is read to compare keys; the meshes are decompressed when they match
+            stored = load_artifacts(project_path, previews=False).get("scene")
+            if stored is not None and stored["key"] == key:
+                stored = load_artifacts(project_path, meshes=True, previews=False)["scene"]
+                return StoredScene(stored["meshes"], stored["n_parts"], key)
+    model_scene = build_scene(*inputs, profile=profile)
+    return StoredScene.from_scene(model_scene, key)
+
+
+def export_project(project_data, model_path=None, png_path=None, height_ft=None, wall_thickness_ft=None, profile=None,
+                   project_path=None):
+    """Build the scene for a loaded project dict and write the model and/or a PNG preview.
+
+    With project_path, meshes stored in the project are reused when they match (see project_scene).
+    """
+    height_ft = height_ft or project_data.get("default_height") or DEFAULT_HEIGHT
+    wall_thickness_ft = wall_thickness_ft or project_data.get("wall_thickness") or DEFAULT_WALL_THICKNESS
+    model_scene = project_scene(project_data, height_ft, wall_thickness_ft, project_path, profile=profile)
+    if model_path:
+        with timed(profile, "export/model"):
+            export_model(model_scene, model_path)
+    if png_path:
+        with timed(profile, "export/png"):
+            render_png(model_scene, png_path)
+    return model_scene
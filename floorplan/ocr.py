@@ -0,0 +1,109 @@
+"""EasyOCR reader construction and the process-wide shared reader.
+
+The reader is only built on first use (get_reader). Batch drivers can call
+preload_reader() before forking so that pool workers inherit the loaded
+weights instead of initialising their own copy; only for a CPU reader
+(see reader_uses_gpu), since CUDA cannot be re-initialised in a forked child.
+
+Environment overrides, handy for the GUI and for batch nodes:
+
+- FLOORPLAN_OCR_GPU: "auto" (default) uses the GPU when CUDA is available,
+  "1"/"on" prefers the GPU without probing for it first, "0"/"off" skips the
+  GPU probe entirely. When a GPU reader cannot be built, both "auto" and "on"
+  fall back to the CPU with a printed warning; neither requires a GPU.
+- FLOORPLAN_OCR_MODEL_DIR: directory holding pre-downloaded EasyOCR models;
+  when set, nothing is downloaded.
+"""
+
+import os
+import threading
+
+_reader = None
+_reader_failed = False
+_reader_lock = threading.Lock()
+_reader_config = {"languages": ("en",), "gpu": None, "model_dir": None}
+
+
+def _gpu_from_env():
+    value = os.environ.get("FLOORPLAN_OCR_GPU", "auto").strip().lower()
+    if value in ("1", "on", "true", "yes"): return True
+    if value in ("0", "off", "false", "no"): return False
+    return None
+
+
+def _cuda_available():
+    try:
+        import torch
+        return torch.cuda.is_available()
+    except Exception:
+        return False
+
+
+def load_easyocr_reader(languages=("en",), gpu=None, model_dir=None):
+    # gpu=None probes CUDA once (cheaply, through torch) instead of building a GPU reader that fails
+    try:
+        import easyocr # Heavy (torch); only imported when OCR is actually needed
+    except ImportError as e:
+        print(f"EasyOCR not installed: {e}. Text extraction will fail.")
+        return None
+
+    if gpu is None:
+        gpu = _cuda_available()
+    reader_kwargs = {}
+    if model_dir:
+        reader_kwargs = {"model_storage_directory": model_dir, "download_enabled": False}
+
+    if gpu:
+        try:
+            reader = easyocr.Reader(list(languages), gpu=True, **reader_kwargs)
+            print("EasyOCR loaded with GPU support.")
+            return reader
+        except Exception as e:
+            print(f"Could not load EasyOCR with GPU, trying CPU: {e}")
+    try:
+        reader = easyocr.Reader(list(languages), gpu=False, **reader_kwargs)
+        print("EasyOCR loaded with CPU support.")
+        return reader
+    except Exception as e_cpu:
+        print(f"Could not load EasyOCR on CPU: {e_cpu}. Text extraction will fail.")
+        return None
+
+
+def configure_reader(languages=None, gpu=None, model_dir=None):
+    # Must be called before the shared reader is first built to have any effect
+    if languages is not None: _reader_config["languages"] = tuple(languages)
+    if gpu is not None: _reader_config["gpu"] = gpu
+    if model_dir is not None: _reader_config["model_dir"] = model_dir
+
+
+def _configured_gpu():
+    return _reader_config["gpu"] if _reader_config["gpu"] is not None else _gpu_from_env()
+
+
+def reader_uses_gpu():
+    # Whether the shared reader will try the GPU; probes CUDA for "auto" without initialising it
+    gpu = _configured_gpu()
+    return _cuda_available() if gpu is None else gpu
+
+
+def get_reader():
+    """Return the shared reader, building it on first call (None if OCR is unavailable)."""
+    global _reader, _reader_failed
+    if _reader is not None or _reader_failed:
+        return _reader
+    with _reader_lock:
+        if _reader is None and not _reader_failed:
+            gpu = _configured_gpu()
+            model_dir = _reader_config["model_dir"] or os.environ.get("FLOORPLAN_OCR_MODEL_DIR")
+            _reader = load_easyocr_reader(_reader_config["languages"], gpu=gpu, model_dir=model_dir)
+            _reader_failed = _reader is None
+    return _reader
+
+
+def preload_reader(warm_up=False):
+    # warm_up runs one tiny inference; skip it when forking afterwards (OpenMP pools are not fork-safe)
+    reader = get_reader()
+    if reader is not None and warm_up:
+        import numpy as np
+        reader.readtext(np.full((32, 32, 3), 255, dtype=np.uint8), detail=1, paragraph=False)
+    return reader
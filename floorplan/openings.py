@@ -0,0 +1,302 @@
+"""Door and window detection along detected walls.
+
+Every wall is analysed in a narrow band of pixels sampled along its own line
+(slanted walls included), never in a full-image pass:
+
+1. The across-wall darkness profile gives the wall's centre and thickness.
+2. Each position along the wall is classified as solid wall, empty, or
+   partial (some but not all of the thickness is ink).
+3. Runs of non-solid positions of door/window size are openings:
+   - mostly partial with two or more thin lines across -> window symbol,
+   - mostly empty with a door leaf and a quarter swing arc at one end -> door.
+   Empty runs without a door symbol are plain passages and are left alone.
+
+Door gaps wider than the wall merge distance split a wall in two; such a gap
+is found past the end of the first wall and, when it holds a door or window,
+the two collinear walls are joined into one wall with the opening in it.
+Walls are scanned on a thread pool.
+"""
+
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from floorplan.preprocess import preprocess
+from floorplan.spatial import SpatialIndex
+
+# Opening sizes in feet; the heights and sill go into detected openings, the GUI uses all of them for manual ones
+DOOR_WIDTH_DEFAULT = 2.8
+DOOR_HEIGHT_DEFAULT = 6.8
+WINDOW_WIDTH_DEFAULT = 3.0
+WINDOW_HEIGHT_DEFAULT = 4.0
+WINDOW_SILL_DEFAULT = 3.0
+
+DARK_LEVEL = 128 # Gray values below this are ink
+OPENING_MIN_FT = 1.5
+OPENING_MAX_FT = 10.0
+OPENING_PX_FALLBACK = (12, 200) # Opening size range when the scale is unknown (below 3 px/ft)
+WALL_BAND_FT = 1.0 # Half-width of the band searched for the wall's ink
+WALL_BAND_PX_FALLBACK = 20
+SOLID_FILL = 0.75
+EMPTY_FILL = 0.05
+MAJORITY = 0.5
+SWING_MIN_HITS = 0.6 # Fraction of door leaf and arc samples that must be ink
+ARC_SAMPLES = 16
+THIN_WALL_RATIO = 0.5 # Lines thinner than this fraction of the median wall are symbols, not walls
+MIN_PARALLEL_WALLS = 16 # Fewer walls are scanned on the calling thread
+
+
+def _axes(wall):
+    # (along axis, across axis) image indices: x/y for horizontal walls, y/x for vertical ones
+    return (0, 1) if wall.get("type") != "vertical" else (1, 0)
+
+
+def _is_dark(gray, along_axis, along, across):
+    # Ink test at (along, across) points of any shape, with a one-pixel tolerance in every direction
+    height, width = gray.shape
+    step = np.array([-1, 0, 1])
+    along = np.rint(np.asarray(along, dtype=np.float64)).astype(np.int64)[..., None, None] + step[:, None]
+    across = np.rint(np.asarray(across, dtype=np.float64)).astype(np.int64)[..., None, None] + step[None, :]
+    xs, ys = (along, across) if along_axis == 0 else (across, along)
+    xs, ys = np.broadcast_arrays(xs, ys)
+    inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+    dark = (gray[ys.clip(0, height - 1), xs.clip(0, width - 1)] < DARK_LEVEL) & inside
+    return dark.any(axis=(-2, -1))
+
+
+def _runs(mask):
+    # (start, end) index pairs of the True runs of a 1-D boolean array, end exclusive
+    padded = np.concatenate(([False], mask, [False]))
+    changes = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(changes[::2], changes[1::2]))
+
+
+def _count_runs(rows):
+    # Number of separate ink runs across the band, per along position
+    padded = np.pad(rows, ((0, 0), (1, 0)))
+    return (padded[:, 1:] & ~padded[:, :-1]).sum(axis=1)
+
+
+def _swing_score(gray, along_axis, c0, gap_lo, gap_hi, thickness):
+    # How well the gap matches a door symbol: a leaf square to the wall at one jamb and a quarter arc from the
+    # leaf's tip to the other jamb, on either side of the wall. Scored as the worse of the leaf's and the arc's
+    # ink fractions, for the best hinge; the hinge may sit up to one wall thickness inside the jamb and the arc may
+    # overshoot the far jamb as much
+    angles = np.radians(np.linspace(12, 78, ARC_SAMPLES))
+    steps = np.linspace(0.25, 0.95, ARC_SAMPLES)
+    shifts = np.linspace(0.0, thickness, 5)
+    inset, extra = np.meshgrid(shifts, shifts, indexing="ij")
+    inset, extra = inset.ravel(), extra.ravel()
+    radius = (gap_hi - gap_lo) + inset + extra
+    # A hinge at the low jamb swings towards +along, one at the high jamb towards -along
+    hinge_end = np.array([gap_lo, gap_hi])[:, None]
+    direction = np.array([1.0, -1.0])[:, None]
+    hinge = (hinge_end - direction * inset)[:, None, :, None]
+    side = np.array([-1.0, 1.0])[None, :, None, None]
+    arc_along, arc_across = np.broadcast_arrays(hinge + (direction * radius)[:, None, :, None] * np.cos(angles),
+                                                c0 + side * radius[None, None, :, None] * np.sin(angles))
+    leaf_along, leaf_across = np.broadcast_arrays(hinge, c0 + side * radius[None, None, :, None] * steps)
+    arc = _is_dark(gray, along_axis, arc_along, arc_across).mean(axis=-1)
+    leaf = _is_dark(gray, along_axis, leaf_along, leaf_across).mean(axis=-1)
+    return float(np.minimum(arc, leaf).max())
+
+
+def scan_wall(gray, wall, min_px, max_px, band_px):
+    """(thickness, openings) of one wall; openings are [(kind, gap_lo, gap_hi, inside)] in along-axis pixels.
+
+    inside is False for a gap past the wall's far (higher coordinate) end, i.e. between this wall and the next.
+    The thickness is 0 when no wall ink is found along the detected line.
+    """
+    along_axis, across_axis = _axes(wall)
+    a0, a1 = wall["start"][along_axis], wall["end"][along_axis]
+    c_start, c_end = wall["start"][across_axis], wall["end"][across_axis]
+    if a0 > a1:
+        a0, a1, c_start, c_end = a1, a0, c_end, c_start
+    if a1 - a0 < 1: return 0, []
+    slope = (c_end - c_start) / (a1 - a0)
+    limit = gray.shape[1 - along_axis] # Number of along positions in the image
+    across_limit = gray.shape[along_axis]
+
+    along = np.arange(max(0, int(a0) - 2), min(limit, int(math.ceil(a1)) + max_px + 3))
+    if len(along) < 3: return 0, []
+    offsets = np.arange(-band_px, band_px + 1)
+    c_line = int(round(c_start))
+    if c_start == c_end and band_px <= c_line < across_limit - band_px:
+        # Exactly horizontal/vertical and clear of the image border (the usual case): a plain slice
+        along_slice, across_slice = slice(along[0], along[-1] + 1), slice(c_line - band_px, c_line + band_px + 1)
+        band = gray[across_slice, along_slice].T if along_axis == 0 else gray[along_slice, across_slice]
+        dark = band < DARK_LEVEL
+    else:
+        line = c_start + (along - a0) * slope
+        across = np.rint(line)[:, None].astype(np.int64) + offsets[None, :]
+        valid = (across >= 0) & (across < across_limit)
+        across_clipped = across.clip(0, across_limit - 1)
+        band = gray[across_clipped, along[:, None]] if along_axis == 0 else gray[along[:, None], across_clipped]
+        dark = (band < DARK_LEVEL) & valid
+
+    # Wall centre and thickness: the run of mostly-ink offsets closest to the detected line
+    in_wall = (along >= a0) & (along <= a1)
+    profile = dark[in_wall].mean(axis=0)
+    candidates = _runs(profile >= 0.5)
+    if not candidates: return 0, []
+    lo, hi = min(candidates, key=lambda run: min(abs(offsets[run[0]]), abs(offsets[run[1] - 1]))
+                 if not (offsets[run[0]] <= 0 <= offsets[run[1] - 1]) else 0)
+    thickness = hi - lo
+    center_offset = (offsets[lo] + offsets[hi - 1]) / 2.0
+    core = dark[:, lo:hi]
+    fill = core.mean(axis=1)
+    solid = fill >= SOLID_FILL
+    # Ticks, leaves and arcs cross the band for a pixel or two; they do not end an opening
+    bridge = max(2, thickness // 3)
+    for start, end in _runs(solid):
+        if end - start <= bridge and start > 0 and end < len(solid): solid[start:end] = False
+    runs = [(start, end) for start, end in _runs(~solid) # Bounded by wall on both sides, of opening size
+            if start > 0 and end < len(solid) and min_px <= along[end - 1] + 1 - along[start] <= max_px]
+    if not runs: return thickness, []
+    wide = dark[:, max(0, lo - 2):min(dark.shape[1], hi + 2)]
+    empty = fill <= EMPTY_FILL
+
+    found = []
+    for start, end in runs:
+        gap_lo, gap_hi = float(along[start]), float(along[end - 1] + 1)
+        inside = (gap_lo + gap_hi) / 2.0 <= a1
+        partial = ~empty[start:end]
+        if (partial & (_count_runs(wide[start:end]) >= 2)).mean() >= MAJORITY:
+            kind = "window"
+        elif (~partial).mean() >= MAJORITY:
+            c0 = c_start + ((gap_lo + gap_hi) / 2.0 - a0) * slope + center_offset
+            if _swing_score(gray, along_axis, c0, gap_lo, gap_hi, thickness) < SWING_MIN_HITS:
+                continue
+            kind = "door"
+        else:
+            continue
+        found.append((kind, gap_lo, gap_hi, inside))
+    return thickness, found
+
+
+def _opening(kind, position_px, width_px, scale_factor):
+    if kind == "door":
+        return {"position_on_wall": position_px, "width_px": width_px, "height_px": DOOR_HEIGHT_DEFAULT * scale_factor,
+                "sill_px": 0, "type": "door"}
+    return {"position_on_wall": position_px, "width_px": width_px, "height_px": WINDOW_HEIGHT_DEFAULT * scale_factor,
+            "sill_px": WINDOW_SILL_DEFAULT * scale_factor, "type": "window"}
+
+
+def _along_to_wall(wall, along_axis, u):
+    # Distance from wall["start"] along the wall for along-axis coordinate u
+    a_start, a_end = wall["start"][along_axis], wall["end"][along_axis]
+    stretch = wall["length"] / abs(a_end - a_start) if a_end != a_start else 1.0
+    return abs(u - a_start) * stretch
+
+
+def _find_next_wall(index, walls, i, gap_hi, tolerance, thickness):
+    # A wall of the same orientation starting where the gap ends, on the same line (within the wall's thickness)
+    wall = walls[i]
+    along_axis, across_axis = _axes(wall)
+    a0, a1 = sorted((wall["start"][along_axis], wall["end"][along_axis]))
+    c = wall["start"][across_axis] if wall["start"][along_axis] == a1 else wall["end"][across_axis]
+    point = (gap_hi, c) if along_axis == 0 else (c, gap_hi)
+    for _, kind, j in index.walls_near_point(point[0], point[1], tolerance):
+        other = walls[j]
+        if kind != "wall" or j == i or other.get("type") != wall.get("type"): continue
+        low_end = min((other["start"], other["end"]), key=lambda p: p[along_axis])
+        if abs(low_end[along_axis] - gap_hi) <= tolerance and abs(low_end[across_axis] - c) <= thickness:
+            return j
+    return None
+
+
+def detect_openings(image_cv, walls, scale_factor, max_workers=None):
+    """Set every wall's "openings" from the image; returns the wall list, with walls split by a door gap joined.
+
+    image_cv is the grayscale or BGR plan (ideally with text masked) or its floorplan.preprocess.Preprocessed,
+    walls as returned by detect_walls.
+    """
+    if not walls: return walls
+    gray = preprocess(image_cv).gray
+    if scale_factor >= 3:
+        min_px, max_px = OPENING_MIN_FT * scale_factor, OPENING_MAX_FT * scale_factor
+        band_px = max(4, int(round(WALL_BAND_FT * scale_factor)))
+    else:
+        (min_px, max_px), band_px = OPENING_PX_FALLBACK, WALL_BAND_PX_FALLBACK
+    max_px = int(math.ceil(max_px))
+
+    def scan(wall):
+        return scan_wall(gray, wall, min_px, max_px, band_px) if wall.get("type") in ("horizontal", "vertical") else (0, [])
+
+    workers = max_workers or os.cpu_count() or 1
+    if len(walls) < MIN_PARALLEL_WALLS or workers == 1:
+        results = [scan(wall) for wall in walls]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(scan, walls))
+
+    for wall in walls:
+        wall["openings"] = []
+    # Door leaves and arcs picked up as short walls are much thinner than the walls themselves
+    thicknesses = [thickness for thickness, _ in results if thickness > 0]
+    min_thickness = float(np.median(thicknesses)) * THIN_WALL_RATIO if thicknesses else 0.0
+    index = None
+    links = {} # wall index -> (next wall index or None, kind, gap_lo, gap_hi)
+    linked = set()
+    for i, (thickness, found) in enumerate(results):
+        if thickness < min_thickness: continue
+        along_axis, _ = _axes(walls[i])
+        for kind, gap_lo, gap_hi, inside in found:
+            if inside:
+                center = _along_to_wall(walls[i], along_axis, (gap_lo + gap_hi) / 2.0)
+                width = _along_to_wall(walls[i], along_axis, gap_hi) - _along_to_wall(walls[i], along_axis, gap_lo)
+                walls[i]["openings"].append(_opening(kind, center, abs(width), scale_factor))
+            elif i not in links:
+                if index is None:
+                    index = SpatialIndex(max(32.0, max_px))
+                    for k, wall in enumerate(walls):
+                        index.add_wall(k, wall["start"], wall["end"])
+                j = _find_next_wall(index, walls, i, gap_hi, band_px, thickness)
+                # Without a detected wall beyond the gap the wall is carried to the far jamb, which scan_wall saw
+                links[i] = (j if j not in linked else None, kind, gap_lo, gap_hi)
+                linked.add(links[i][0])
+    if not links:
+        return walls
+
+    joined = []
+    for i, wall in enumerate(walls):
+        if i in linked: continue # Part of a chain that starts at another wall
+        if i not in links:
+            joined.append(wall)
+            continue
+        chain, gaps, end_along = [i], [], None
+        while chain[-1] in links and len(chain) <= len(walls):
+            j, kind, gap_lo, gap_hi = links[chain[-1]]
+            gaps.append((kind, gap_lo, gap_hi))
+            if j is None:
+                end_along = gap_hi
+                break
+            chain.append(j)
+        joined.append(_join_walls([walls[k] for k in chain], gaps, scale_factor, end_along))
+    return joined
+
+
+def _join_walls(chain, gaps, scale_factor, end_along=None):
+    # One wall from the low end of the first to the high end of the last (or to end_along), keeping every opening
+    along_axis, _ = _axes(chain[0])
+    start = min((chain[0]["start"], chain[0]["end"]), key=lambda p: p[along_axis])
+    end = max((chain[-1]["start"], chain[-1]["end"]), key=lambda p: p[along_axis])
+    if end_along is not None:
+        end = (end_along, end[1]) if along_axis == 0 else (end[0], end_along)
+    joined = {"start": tuple(start), "end": tuple(end), "type": chain[0]["type"],
+              "length": float(math.hypot(end[0] - start[0], end[1] - start[1])), "openings": []}
+    for wall in chain:
+        for opening in wall.get("openings", []):
+            # Back to an along coordinate on the old wall, then to a distance on the joined one
+            a_start, a_end = wall["start"][along_axis], wall["end"][along_axis]
+            stretch = abs(a_end - a_start) / wall["length"] if wall["length"] else 1.0
+            u = a_start + math.copysign(opening["position_on_wall"] * stretch, a_end - a_start)
+            joined["openings"].append(dict(opening, position_on_wall=_along_to_wall(joined, along_axis, u)))
+    for kind, gap_lo, gap_hi in gaps:
+        center = _along_to_wall(joined, along_axis, (gap_lo + gap_hi) / 2.0)
+        width = abs(_along_to_wall(joined, along_axis, gap_hi) - _along_to_wall(joined, along_axis, gap_lo))
+        joined["openings"].append(_opening(kind, center, width, scale_factor))
+    joined["openings"].sort(key=lambda o: o["position_on_wall"])
+    return joined
@@ -0,0 +1,81 @@
+"""Detection overlay as drawing primitives in original-image pixel coordinates.
+
+The GUI turns these into canvas items on top of the (cached, resized) plan
+image instead of burning them into a full-resolution copy, so adding or
+editing one room only replaces that room's items. Primitives are tuples:
+
+- ("rect", (x1, y1, x2, y2), color)
+- ("line", (x1, y1, x2, y2), color, width)
+- ("polyline", ((x, y), ...), color, width)
+- ("text", (x, y), text, color)
+
+Widths are screen pixels; colours are Tk colour strings.
+"""
+
+import numpy as np
+
+ROOM_BOUNDS_COLOR = "#0000FF"
+ROOM_OUTLINE_COLOR = "#8080FF" # Segmented room shapes
+LABEL_COLOR = "#800000"
+WALL_COLOR = "#008000"
+DOOR_COLOR = "#FF0000"
+WINDOW_COLOR = "#00A5FF"
+CURVE_COLOR = "#00C8C8"
+WALL_WIDTH = 2
+OPENING_WIDTH = 3
+CURVE_WIDTH = 2
+ROOM_OUTLINE_WIDTH = 1
+
+
+def room_primitives(room_name, data, scale_factor):
+    primitives = []
+    if data.get("polygon_px"):
+        outline = [tuple(point) for point in data["polygon_px"]]
+        primitives.append(("polyline", (*outline, outline[0]), ROOM_OUTLINE_COLOR, ROOM_OUTLINE_WIDTH))
+    text = room_name
+    label_x, label_y = 0, 0
+    if "ocr_bbox_center_pixels" in data:
+        label_x, label_y = data["ocr_bbox_center_pixels"]
+        if data.get("dim_str") and data["dim_str"] != "To be OCR'd":
+            text += f"\n{data['dim_str']}"
+    elif "pixel_bounds" in data:
+        x1, y1, x2, y2 = data["pixel_bounds"]
+        primitives.append(("rect", (x1, y1, x2, y2), ROOM_BOUNDS_COLOR))
+        label_x, label_y = (x1 + x2) / 2, y1 - 10
+        if data.get("dim_str") and data["dim_str"] != "To be OCR'd":
+            text += f"\n{data['dim_str']}"
+        elif data.get("dim_str") == "To be OCR'd":
+            text += "\n(To be OCR'd)"
+    elif "position" in data and scale_factor > 0:
+        center_x_ft, center_y_ft = data["position"]
+        label_x, label_y = center_x_ft * scale_factor, center_y_ft * scale_factor
+        text += f"\n{data.get('dim_str', '')}"
+
+    if label_x > 0 and label_y > 0:
+        primitives.append(("text", (label_x, max(10, label_y)), text, LABEL_COLOR))
+    return primitives
+
+
+def wall_primitives(wall, scale_factor):
+    primitives = [("line", (*wall["start"], *wall["end"]), WALL_COLOR, WALL_WIDTH)]
+    if "openings" not in wall or scale_factor <= 0:
+        return primitives
+    p1 = np.array(wall["start"], dtype=float)
+    wall_vec = np.array(wall["end"], dtype=float) - p1
+    wall_len_px = np.linalg.norm(wall_vec)
+    if wall_len_px < 1e-6:
+        return primitives
+    unit = wall_vec / wall_len_px
+    for opening in wall["openings"]:
+        start = p1 + unit * (opening["position_on_wall"] - opening["width_px"] / 2)
+        end = p1 + unit * (opening["position_on_wall"] + opening["width_px"] / 2)
+        color = DOOR_COLOR if opening["type"] == "door" else WINDOW_COLOR
+        primitives.append(("line", (start[0], start[1], end[0], end[1]), color, OPENING_WIDTH))
+    return primitives
+
+
+def curve_primitives(curve):
+    points = [(p[0], p[1]) for p in curve["points"]]
+    if len(points) < 2:
+        return []
+    return [("polyline", tuple(points), CURVE_COLOR, CURVE_WIDTH)]
@@ -0,0 +1,89 @@
+"""Preprocessing shared by the wall, curved wall and opening detectors.
+
+All detectors work on the same text-masked image: grayscale, then a 3x3
+median blur, and only after that their own adaptive threshold and morphology.
+A Preprocessed wraps the image and computes the grayscale and blurred
+versions on first use, once, so detectors running on different threads share
+them. Each detector takes either a plain image or a Preprocessed. Once the
+wall detectors are done, release_blurred() frees the blurred copy; the opening
+detection only needs the grayscale, which for grayscale input is the image
+itself.
+
+adaptive_threshold binarizes in bands of THRESHOLD_BAND_ROWS rows, each read
+with a margin of the kernel radius, so the result is exactly that of one
+cv2.adaptiveThreshold call, whose working memory (several times the image
+on large scans) is bounded by the band instead.
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+from floorplan.profiling import timed
+
+MEDIAN_BLUR_SIZE = 3
+THRESHOLD_BAND_ROWS = 1024
+
+
+def to_gray(image_cv):
+    # The detectors only need intensity; grayscale input is passed through without a copy
+    return image_cv if image_cv.ndim == 2 else cv2.cvtColor(image_cv, cv2.COLOR_BGR2GRAY)
+
+
+def adaptive_threshold(blurred, block_size, c, band_rows=THRESHOLD_BAND_ROWS):
+    """cv2.adaptiveThreshold(blurred, 255, ADAPTIVE_THRESH_GAUSSIAN_C, THRESH_BINARY_INV, block_size, c), by bands."""
+    height = blurred.shape[0]
+    if height <= band_rows:
+        return cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV,
+                                     block_size, c)
+    binarized = np.empty_like(blurred)
+    radius = block_size // 2
+    for y0 in range(0, height, band_rows):
+        y1 = min(height, y0 + band_rows)
+        top, bottom = max(0, y0 - radius), min(height, y1 + radius) # The filter is isolated to the band it is given
+        band = cv2.adaptiveThreshold(blurred[top:bottom], 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                     cv2.THRESH_BINARY_INV, block_size, c)
+        binarized[y0:y1] = band[y0 - top:y1 - top]
+    return binarized
+
+
+class Preprocessed:
+    def __init__(self, image_cv, profile=None):
+        self.image = image_cv
+        self.shape = image_cv.shape
+        self.profile = profile
+        self._gray = None
+        self._blurred = None
+        self._lock = threading.Lock() # The first detector to ask computes; the others wait for it
+
+    @property
+    def gray(self):
+        if self._gray is None:
+            with self._lock:
+                if self._gray is None:
+                    self._gray = self._timed("preprocess/gray", lambda: to_gray(self.image))
+        return self._gray
+
+    @property
+    def blurred(self):
+        if self._blurred is None:
+            gray = self.gray
+            with self._lock:
+                if self._blurred is None:
+                    self._blurred = self._timed("preprocess/blur", lambda: cv2.medianBlur(gray, MEDIAN_BLUR_SIZE))
+        return self._blurred
+
+    def release_blurred(self):
+        # Asked for again, it is recomputed
+        with self._lock:
+            self._blurred = None
+
+    def _timed(self, name, compute):
+        with timed(self.profile, name):
+            return compute()
+
+
+def preprocess(image_cv, profile=None):
+    """image_cv as a Preprocessed (returned as is when it already is one)."""
+    return image_cv if isinstance(image_cv, Preprocessed) else Preprocessed(image_cv, profile)
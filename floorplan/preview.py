@@ -0,0 +1,98 @@
+"""Downscaled previews of the plan image for display.
+
+PreviewCache keeps a power-of-two pyramid of the source image (level k is
+1/2**k of the full size, each built from the previous level with a box
+reduce) and renders any region of the source at any scale from the smallest
+level that is still at least as detailed as the target. A redraw therefore
+resamples at most about twice the canvas area, whatever the resolution of
+the scan, and the last few rendered views are kept so repeating a redraw
+costs nothing.
+
+The levels can be seeded from a saved project (stored_levels), in which case
+the source image is only decoded when a view needs full resolution.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+from PIL.Image import Resampling
+
+MAX_VIEWS = 4 # Rendered views kept
+
+
+class PreviewCache:
+    def __init__(self, image, levels=None):
+        # image: PIL image, level 0, never copied. It may be opened lazily and in any mode; it is converted to RGB
+        # only when level 0 is used. levels: {k: uint8 array or PIL image} of stored levels k >= 1
+        self.image = image
+        self.levels = {0: image}
+        for k, level in (levels or {}).items():
+            level = level if isinstance(level, Image.Image) else Image.fromarray(level)
+            # A level that does not fit the image (replaced since the levels were stored) is rebuilt instead
+            if k > 0 and level.size == self._level_size(k):
+                self.levels[k] = level
+        self._views = OrderedDict() # (box, size) -> image
+
+    @property
+    def size(self):
+        return self.image.size
+
+    def _level_size(self, k):
+        # reduce(2) rounds up
+        width, height = self.size
+        for _ in range(k):
+            width, height = (width + 1) // 2, (height + 1) // 2
+        return width, height
+
+    def level(self, k):
+        if k == 0 and self.image.mode not in ("RGB", "L"):
+            self.image = self.levels[0] = self.image.convert("RGB")
+        if k not in self.levels:
+            previous = self.level(k - 1)
+            if min(previous.size) < 2: return previous
+            self.levels[k] = previous.reduce(2)
+        return self.levels[k]
+
+    def stored_levels(self, max_side):
+        """{k: uint8 array} of the levels k >= 1 whose long side is at most max_side, built if needed."""
+        k = 1
+        while max(self.size) >> k > max_side and min(self.size) >> (k + 1) >= 1:
+            k += 1
+        stored = {}
+        while min(self.size) >> k >= 1:
+            level = self.level(k)
+            if k in self.levels: stored[k] = np.asarray(level)
+            k += 1
+        return stored
+
+    def level_for_scale(self, scale):
+        # Deepest level whose resolution is still >= the requested scale of the source
+        k = 0
+        while scale > 0 and 2 ** (k + 1) <= 1.0 / scale and min(self.size) >> (k + 1) >= 1:
+            k += 1
+        return k
+
+    def fit_scale(self, canvas_size):
+        # Scale that fits the whole image into canvas_size, never enlarging it
+        width, height = self.size
+        scale = min(canvas_size[0] / width if width > 0 else 1, canvas_size[1] / height if height > 0 else 1, 1.0)
+        return scale if scale > 0 else 1.0
+
+    def viewport(self, box, size):
+        """Region box=(x0, y0, x1, y1) of the source, in full-resolution pixels, resampled to size=(w, h)."""
+        key = (tuple(round(v, 3) for v in box), tuple(size))
+        if key in self._views:
+            self._views.move_to_end(key)
+            return self._views[key]
+        scale = min(size[0] / max(box[2] - box[0], 1e-9), size[1] / max(box[3] - box[1], 1e-9))
+        level = self.level(self.level_for_scale(scale))
+        fx, fy = level.width / self.image.width, level.height / self.image.height
+        level_box = (box[0] * fx, box[1] * fy, box[2] * fx, box[3] * fy)
+        # Zoomed in past 1:1 the pixels are shown as they are; below it LANCZOS as before
+        resample = Resampling.NEAREST if scale >= 1 else Resampling.LANCZOS
+        view = level.resize(tuple(size), resample, box=level_box)
+        self._views[key] = view
+        if len(self._views) > MAX_VIEWS:
+            self._views.popitem(last=False)
+        return view
@@ -0,0 +1,133 @@
+"""Per-stage timing and memory instrumentation for one pipeline run.
+
+A Profile records, for every named stage, the wall time, the number of calls
+and the process memory after the stage: current RSS and peak RSS so far.
+Stage names are nested with "/", e.g. "detect_walls/hough". The report's
+total_seconds is the wall time from the first stage start to the last stage
+end, so stages that overlap (run on several threads) or nest are not counted
+twice. Reports are plain
+JSON, so runs can be diffed to catch regressions. cprofile() wraps any block
+in cProfile and dumps a .prof file that snakeviz or pstats can read.
+
+Current RSS comes from /proc/self/statm (Linux) and peak RSS from getrusage
+(Linux/macOS); values that cannot be read are reported as null. Unlike
+tracemalloc, both include OpenCV and NumPy buffers.
+"""
+
+import cProfile
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+REPORT_VERSION = 1
+
+
+def profile_dir_from_env():
+    # FLOORPLAN_PROFILE_DIR turns on per-run reports in the GUI; FLOORPLAN_CPROFILE=1 adds .prof dumps
+    return os.environ.get("FLOORPLAN_PROFILE_DIR") or None
+
+
+def cprofile_from_env():
+    return os.environ.get("FLOORPLAN_CPROFILE", "0").strip().lower() in ("1", "on", "true", "yes")
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError: # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024 # Bytes on macOS, KiB on Linux
+
+
+class Profile:
+    def __init__(self, timings=None):
+        self.timings = timings if timings is not None else {} # stage -> seconds (summed over calls)
+        self.calls = {}
+        self.rss_mb = {}
+        self.peak_rss_mb = {}
+        self.started = None # perf_counter() of the first stage start and of the last stage end
+        self.finished = None
+        self._lock = threading.Lock() # Stages may finish on several threads
+
+    def __getstate__(self):
+        # Profiles come back from worker processes with their PlanResult; the lock does not pickle
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        with self._lock:
+            if self.started is None or start < self.started: self.started = start
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            elapsed = end - start
+            rss, peak = _rss_mb(), _peak_rss_mb()
+            with self._lock:
+                if self.finished is None or end > self.finished: self.finished = end
+                self.timings[name] = self.timings.get(name, 0.0) + elapsed
+                self.calls[name] = self.calls.get(name, 0) + 1
+                self.rss_mb[name] = rss
+                self.peak_rss_mb[name] = peak
+
+    def report(self, **meta):
+        stages = [{"stage": name, "seconds": round(seconds, 6), "calls": self.calls.get(name, 0),
+                   "rss_mb": _round(self.rss_mb.get(name)), "peak_rss_mb": _round(self.peak_rss_mb.get(name))}
+                  for name, seconds in self.timings.items()]
+        return {
+            "version": REPORT_VERSION,
+            "meta": meta,
+            "python": platform.python_version(),
+            "total_seconds": round(self.finished - self.started, 6) if self.finished is not None else 0.0,
+            "peak_rss_mb": _round(_peak_rss_mb()),
+            "stages": stages,
+        }
+
+    def write_json(self, path, **meta):
+        with open(path, "w") as f:
+            json.dump(self.report(**meta), f, indent=4)
+        return path
+
+
+def _round(value):
+    return None if value is None else round(value, 1)
+
+
+def timed(profile, name):
+    # profile may be None, in which case nothing is recorded
+    return profile.stage(name) if profile is not None else nullcontext()
+
+
+@contextmanager
+def cprofile(path):
+    """Run the block under cProfile and dump the stats to path (no-op when path is falsy)."""
+    if not path:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
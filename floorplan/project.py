@@ -0,0 +1,229 @@
+"""Project file format shared by the GUI and the batch converter.
+
+Projects are saved either as indented JSON (.json) or in the compact binary
+format (.npz): a compressed NumPy archive whose "header" member is the JSON of
+everything except the geometry. Wall end points and lengths, and the points of
+all curved walls (concatenated, with per-curve offsets), are stored as arrays.
+Their remaining attributes (type, openings, ...) stay in the header.
+load_project picks the format from the file contents, so existing JSON
+projects keep loading. A .npz project is returned as a ProjectFile whose walls
+and curved walls are only decoded when they are first accessed.
+
+Optionally a project also carries what was derived from it, so reopening it
+needs no recomputation: the raw OCR detections, the preview pyramid (levels up
+to PREVIEW_MAX_SIDE pixels) and the merged 3D meshes together with the key of
+the inputs they were built from (floorplan.scene.scene_key). A .npz project
+embeds them; a JSON project gets them in a <name>.artifacts.npz sidecar.
+"""
+
+import json
+import os
+from collections.abc import Mapping
+
+import numpy as np
+
+DEFAULT_HEIGHT = 9.0
+DEFAULT_WALL_THICKNESS = 0.5
+PROJECT_EXTENSIONS = (".json", ".npz")
+BINARY_FORMAT_VERSION = 1
+GEOMETRY_KEYS = ("walls", "curved_walls")
+_WALL_ARRAY_KEYS = ("start", "end", "length")
+_CURVE_ARRAY_KEYS = ("points", "length")
+_NPZ_MAGIC = b"PK\x03\x04" # .npz files are zip archives
+ARTIFACTS_SUFFIX = ".artifacts.npz"
+PREVIEW_MAX_SIDE = 2048 # Preview levels up to this size are stored; larger ones are rebuilt from the image
+
+
+def build_project_data(image_path, room_dimensions, walls, curved_walls, scale_factor, room_positions,
+                       default_height=DEFAULT_HEIGHT, wall_thickness=DEFAULT_WALL_THICKNESS):
+    return {
+        "image_path": image_path,
+        "room_dimensions": room_dimensions,
+        "walls": walls,
+        "curved_walls": curved_walls,
+        "scale_factor": scale_factor,
+        "default_height": default_height,
+        "wall_thickness": wall_thickness,
+        "room_positions": room_positions
+    }
+
+
+def save_project_json(file_path, project_data):
+    with open(file_path, "w") as f:
+        json.dump(project_data, f, indent=4)
+
+
+def load_project_json(file_path):
+    with open(file_path, "r") as f:
+        return json.load(f)
+
+
+def _coordinates(values, columns):
+    # Detected coordinates are whole pixels; keep them as integers so they load back exactly as saved
+    array = np.asarray(values, dtype=np.float64).reshape(-1, columns)
+    return array.astype(np.int64) if np.array_equal(array, np.round(array)) else array
+
+
+def _artifact_arrays(artifacts):
+    # (header entries, arrays) for the optional artifacts: ocr_results, preview_levels {k: uint8 array} and
+    # scene {"key", "n_parts", "meshes": [(points, faces, color, opacity)]} as returned by SceneBuilder.merged()
+    header, arrays = {}, {}
+    if artifacts.get("ocr_results") is not None:
+        header["ocr_results"] = [[np.asarray(bbox).tolist(), text, float(confidence)]
+                                 for bbox, text, confidence in artifacts["ocr_results"]]
+    for k, level in (artifacts.get("preview_levels") or {}).items():
+        arrays[f"preview_{int(k)}"] = np.asarray(level, dtype=np.uint8)
+    stored_scene = artifacts.get("scene")
+    if stored_scene:
+        header["scene"] = {"key": stored_scene["key"], "n_parts": stored_scene["n_parts"],
+                           "materials": [[color, opacity] for _, _, color, opacity in stored_scene["meshes"]]}
+        for i, (points, faces, _, _) in enumerate(stored_scene["meshes"]):
+            arrays[f"mesh_{i}_points"] = np.asarray(points, dtype=np.float64)
+            arrays[f"mesh_{i}_faces"] = np.asarray(faces, dtype=np.int32 if len(points) < 2 ** 31 else np.int64)
+    return header, arrays
+
+
+def _write_npz(file_path, header, arrays):
+    arrays = {"header": np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8), **arrays}
+    with open(file_path, "wb") as f: # A file object, so numpy does not append its own .npz suffix
+        np.savez_compressed(f, **arrays)
+
+
+def save_project_npz(file_path, project_data, artifacts=None):
+    walls = project_data.get("walls") or []
+    curved_walls = project_data.get("curved_walls") or []
+    header = {key: value for key, value in project_data.items() if key not in GEOMETRY_KEYS}
+    header["binary_format_version"] = BINARY_FORMAT_VERSION
+    header["wall_attributes"] = [{k: v for k, v in wall.items() if k not in _WALL_ARRAY_KEYS} for wall in walls]
+    header["curve_attributes"] = [{k: v for k, v in curve.items() if k not in _CURVE_ARRAY_KEYS}
+                                  for curve in curved_walls]
+    curve_sizes = [len(curve["points"]) for curve in curved_walls]
+    curve_points = [point for curve in curved_walls for point in curve["points"]]
+    arrays = {
+        "wall_endpoints": _coordinates([(*wall["start"], *wall["end"]) for wall in walls], 4),
+        "wall_lengths": np.array([wall.get("length", 0.0) for wall in walls], dtype=np.float64),
+        "curve_points": _coordinates(curve_points, 2),
+        "curve_offsets": np.concatenate([[0], np.cumsum(curve_sizes, dtype=np.int64)]),
+        "curve_lengths": np.array([curve.get("length", 0.0) for curve in curved_walls], dtype=np.float64),
+    }
+    if artifacts:
+        artifact_header, artifact_arrays = _artifact_arrays(artifacts)
+        header["artifacts"] = artifact_header
+        arrays.update(artifact_arrays)
+    _write_npz(file_path, header, arrays)
+
+
+class ProjectFile(Mapping):
+    """A .npz project, read-only dict-like. Only the header is read on open; the geometry arrays are read and
+    turned into wall / curve dicts on first access. wall_endpoints() and curve_points() give the raw arrays."""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._archive = np.load(file_path) # Members are decompressed when accessed
+        self._header = json.loads(self._archive["header"].tobytes().decode("utf-8"))
+        self._wall_attributes = self._header.pop("wall_attributes", [])
+        self._curve_attributes = self._header.pop("curve_attributes", [])
+        self._header.pop("artifacts", None) # Read by load_artifacts
+        self._arrays = {}
+        self._geometry = {}
+
+    def _array(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = self._archive[name]
+        return self._arrays[name]
+
+    def wall_endpoints(self):
+        """(N, 4) array of x1, y1, x2, y2 per wall."""
+        return self._array("wall_endpoints")
+
+    def curve_points(self):
+        """(points (M, 2), offsets (K + 1,)): curve k is points[offsets[k]:offsets[k + 1]]."""
+        return self._array("curve_points"), self._array("curve_offsets")
+
+    def _walls(self):
+        endpoints, lengths = self.wall_endpoints().tolist(), self._array("wall_lengths").tolist()
+        return [{"start": (x1, y1), "end": (x2, y2), "length": length, **attributes}
+                for (x1, y1, x2, y2), length, attributes in zip(endpoints, lengths, self._wall_attributes)]
+
+    def _curved_walls(self):
+        points, offsets = self.curve_points()
+        points, offsets, lengths = points.tolist(), offsets.tolist(), self._array("curve_lengths").tolist()
+        return [{"points": [tuple(p) for p in points[offsets[k]:offsets[k + 1]]], "length": lengths[k], **attributes}
+                for k, attributes in enumerate(self._curve_attributes)]
+
+    def __getitem__(self, key):
+        if key not in GEOMETRY_KEYS:
+            return self._header[key]
+        if key not in self._geometry:
+            self._geometry[key] = self._walls() if key == "walls" else self._curved_walls()
+        return self._geometry[key]
+
+    def __iter__(self):
+        yield from (key for key in self._header if key != "binary_format_version")
+        yield from GEOMETRY_KEYS
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def close(self):
+        self._archive.close()
+
+
+def artifacts_path(project_path):
+    """Where the artifacts of a project live: in the project itself (.npz) or in its sidecar (JSON)."""
+    if project_path.lower().endswith(".npz"): return project_path
+    return os.path.splitext(project_path)[0] + ARTIFACTS_SUFFIX
+
+
+def save_project(file_path, project_data, artifacts=None):
+    """Save as binary .npz when file_path ends in .npz, else as JSON.
+
+    artifacts (see _artifact_arrays) are embedded in a .npz project and written to the sidecar of a JSON one.
+    Saving a JSON project without artifacts removes its sidecar, which would no longer match.
+    """
+    if file_path.lower().endswith(".npz"):
+        save_project_npz(file_path, project_data, artifacts)
+        return
+    save_project_json(file_path, project_data)
+    sidecar = artifacts_path(file_path)
+    if artifacts:
+        header, arrays = _artifact_arrays(artifacts)
+        _write_npz(sidecar, {"binary_format_version": BINARY_FORMAT_VERSION, "artifacts": header}, arrays)
+    elif os.path.exists(sidecar):
+        os.remove(sidecar)
+
+
+def load_project(file_path):
+    """A JSON project as a dict, or a .npz project as a ProjectFile (the format is read from the file itself)."""
+    with open(file_path, "rb") as f:
+        magic = f.read(len(_NPZ_MAGIC))
+    return ProjectFile(file_path) if magic == _NPZ_MAGIC else load_project_json(file_path)
+
+
+def load_artifacts(project_path, meshes=False, previews=True):
+    """The stored artifacts of a project as a dict, {} when there are none.
+
+    Keys, when stored: "ocr_results" [(bbox, text, confidence)], "preview_levels" {k: uint8 array} and "scene"
+    {"key", "n_parts"}; with meshes=True the scene also has "meshes" [(points, faces, color, opacity)].
+    previews=False skips decompressing the preview levels, for callers that only want the scene.
+    """
+    path = artifacts_path(project_path)
+    if not os.path.exists(path): return {}
+    with open(path, "rb") as f:
+        if f.read(len(_NPZ_MAGIC)) != _NPZ_MAGIC: return {}
+    with np.load(path) as archive:
+        header = json.loads(archive["header"].tobytes().decode("utf-8")).get("artifacts") or {}
+        artifacts = {}
+        if "ocr_results" in header:
+            artifacts["ocr_results"] = [(bbox, text, confidence) for bbox, text, confidence in header["ocr_results"]]
+        levels = {int(name[len("preview_"):]): archive[name] for name in archive.files
+                  if previews and name.startswith("preview_")}
+        if levels:
+            artifacts["preview_levels"] = levels
+        if "scene" in header:
+            artifacts["scene"] = {"key": header["scene"]["key"], "n_parts": header["scene"]["n_parts"]}
+            if meshes:
+                artifacts["scene"]["meshes"] = [
+                    (archive[f"mesh_{i}_points"], archive[f"mesh_{i}_faces"].astype(np.int64),
+                     color, opacity) for i, (color, opacity) in enumerate(header["scene"]["materials"])]
+    return artifacts
@@ -0,0 +1,207 @@
+"""Room segmentation from the detected wall topology.
+
+The walls and curved walls (not the image) are drawn into a wall mask on a
+grid coarse enough to keep the mask around MAX_MASK_SIDE cells on its long
+side. Remaining gaps up to ROOM_GAP_FT (doors that were not detected, loose
+wall ends) are closed by growing the walls, the free space is labelled with
+connected components, and each region then grows back into the free cells the
+closing took from it. Regions touching the border are outside the building.
+
+Each room is returned as a polygon in original-image pixels; assign_rooms
+attaches the polygons to the OCR / manual rooms they contain and adds the
+unlabelled ones, so the 3D floor follows the real room shapes.
+"""
+
+import math
+
+import cv2
+import numpy as np
+
+MAX_MASK_SIDE = 1024 # Long side of the wall mask, in cells
+ROOM_GAP_FT = 3.0 # Gaps in the walls up to this wide are closed before labelling
+ROOM_GAP_PX_FALLBACK = 30 # Same, when the scale is unknown (below 3 px/ft)
+MIN_ROOM_FT2 = 15.0 # Smaller regions are shafts, wall slivers and such
+MIN_ROOM_PX2_FALLBACK = 40 * 40
+SHIFT_BITS = 4 # Sub-cell precision of the wall lines drawn into the mask
+OUTLINE_TOLERANCE = 1.5 # Room outlines are simplified to within this many cells
+
+
+def polygon_area(points):
+    # Shoelace formula, absolute value
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) < 3: return 0.0
+    x, y = points[:, 0], points[:, 1]
+    return float(abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2.0)
+
+
+def _signed_area(ring):
+    x, y = ring[:, 0], ring[:, 1]
+    return (np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2.0
+
+
+def _crosses(p, q, rings):
+    # Whether segment p-q properly crosses an edge of any ring (touching at an end point does not count)
+    for ring in rings:
+        a, b = ring, np.roll(ring, -1, axis=0)
+        d1 = (q[0] - p[0]) * (a[:, 1] - p[1]) - (q[1] - p[1]) * (a[:, 0] - p[0])
+        d2 = (q[0] - p[0]) * (b[:, 1] - p[1]) - (q[1] - p[1]) * (b[:, 0] - p[0])
+        d3 = (b[:, 0] - a[:, 0]) * (p[1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (p[0] - a[:, 0])
+        d4 = (b[:, 0] - a[:, 0]) * (q[1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (q[0] - a[:, 0])
+        if ((d1 * d2 < 0) & (d3 * d4 < 0)).any(): return True
+    return False
+
+
+def _bridge_holes(outer, holes):
+    # One ring for a region with holes: each hole is joined to the ring by a cut that runs there and back, so
+    # the outline stays a single (weakly simple) polygon that fillPoly, pointPolygonTest and the floor
+    # bands all handle. A hole that cannot be reached without crossing an edge is left out
+    ring = outer
+    outer_sign = np.sign(_signed_area(outer))
+    for hole in sorted(holes, key=lambda h: -h[:, 0].max()):
+        if np.sign(_signed_area(hole)) == outer_sign:
+            hole = hole[::-1]
+        j = int(np.argmax(hole[:, 0]))
+        for i in np.argsort(np.hypot(ring[:, 0] - hole[j, 0], ring[:, 1] - hole[j, 1])):
+            if not _crosses(ring[i], hole[j], [ring, *holes]):
+                ring = np.concatenate([ring[:i + 1], hole[j:], hole[:j + 1], ring[i:]])
+                break
+    return ring
+
+
+def wall_mask(walls, curved_walls, shape, cell):
+    """uint8 mask (255 = wall) of the walls and curves on a grid of cell x cell pixel cells covering shape."""
+    height, width = shape[:2]
+    mask = np.zeros((math.ceil(height / cell), math.ceil(width / cell)), dtype=np.uint8)
+    factor = (1 << SHIFT_BITS) / cell
+
+    def fixed(point):
+        return (int(round(point[0] * factor)), int(round(point[1] * factor)))
+
+    for wall in walls:
+        cv2.line(mask, fixed(wall["start"]), fixed(wall["end"]), 255, 1, cv2.LINE_8, SHIFT_BITS)
+    paths = [np.rint(np.asarray(c["points"], dtype=np.float64).reshape(-1, 2) * factor).astype(np.int32)
+             for c in curved_walls if len(c["points"]) > 1]
+    if paths:
+        cv2.polylines(mask, paths, False, 255, 1, cv2.LINE_8, SHIFT_BITS)
+    return mask
+
+
+def segment_rooms(walls, curved_walls, image_shape, scale_factor, max_side=MAX_MASK_SIDE):
+    """Enclosed regions of the plan as [{"polygon_px", "area_px", "bounds_px", "anchor_px"}], largest first.
+
+    anchor_px is the interior point farthest from the region's walls, a good place for a label.
+    """
+    if not walls and not curved_walls: return []
+    cell = max(1, math.ceil(max(image_shape[:2]) / max_side))
+    mask = wall_mask(walls, curved_walls, image_shape, cell)
+    if scale_factor >= 3:
+        gap_px, min_area_px = ROOM_GAP_FT * scale_factor, MIN_ROOM_FT2 * scale_factor ** 2
+    else:
+        gap_px, min_area_px = ROOM_GAP_PX_FALLBACK, MIN_ROOM_PX2_FALLBACK
+    radius = max(1, int(round(gap_px / 2 / cell)))
+
+    free = mask == 0
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * radius + 1, 2 * radius + 1))
+    closed_free = (cv2.dilate(mask, kernel) == 0).astype(np.uint8)
+    # 4-connectivity: a one-cell diagonal wall line must not leak
+    n_labels, labels, stats, _ = cv2.connectedComponentsWithStats(closed_free, connectivity=4)
+    if n_labels <= 1: return []
+
+    # Give every free cell the closing took to the nearest region, so each region keeps its real extent. Walls
+    # are closed on both sides by the same radius, so the nearest region is the one on the cell's own side
+    _, nearest = cv2.distanceTransformWithLabels((labels == 0).astype(np.uint8), cv2.DIST_L2, 3,
+                                                 labelType=cv2.DIST_LABEL_CCOMP)
+    labelled = labels > 0
+    region_of = np.zeros(int(nearest.max()) + 1, dtype=np.int32)
+    region_of[nearest[labelled]] = labels[labelled]
+    labels = np.where(free & ~labelled, region_of[nearest], labels)
+
+    outside = set(np.unique(np.concatenate([labels[0], labels[-1], labels[:, 0], labels[:, -1]])).tolist())
+    rooms = []
+    for label in range(1, n_labels):
+        if label in outside: continue
+        # The region grew by about the closing radius past its labelled box
+        x, y, w, h = stats[label, :4]
+        x0, y0 = max(0, x - radius - 2), max(0, y - radius - 2)
+        x1, y1 = min(labels.shape[1], x + w + radius + 2), min(labels.shape[0], y + h + radius + 2)
+        region = (labels[y0:y1, x0:x1] == label).astype(np.uint8)
+        area = int(region.sum())
+        if area * cell * cell < min_area_px: continue
+        contours, hierarchy = cv2.findContours(region, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours: continue
+        outer = max((k for k in range(len(contours)) if hierarchy[0][k][3] < 0), key=lambda k: cv2.contourArea(contours[k]))
+        ring = cv2.approxPolyDP(contours[outer], OUTLINE_TOLERANCE, True).reshape(-1, 2)
+        if len(ring) < 3: continue
+        # Other rooms inside this one are holes in its floor; wall stubs and specks are not
+        holes = [cv2.approxPolyDP(contours[k], OUTLINE_TOLERANCE, True).reshape(-1, 2) for k in range(len(contours))
+                 if hierarchy[0][k][3] == outer and cv2.contourArea(contours[k]) * cell * cell >= min_area_px]
+        ring = _bridge_holes(ring.astype(np.float64), [hole.astype(np.float64) for hole in holes if len(hole) >= 3])
+        polygon = (ring + (x0 + 0.5, y0 + 0.5)) * cell
+        distance = cv2.distanceTransform(np.pad(region, 1), cv2.DIST_L2, 3)[1:-1, 1:-1]
+        anchor_y, anchor_x = np.unravel_index(int(np.argmax(distance)), distance.shape)
+        rows, cols = np.nonzero(region.any(axis=1))[0], np.nonzero(region.any(axis=0))[0]
+        rooms.append({
+            "polygon_px": [(float(px), float(py)) for px, py in polygon],
+            "area_px": float(area * cell * cell),
+            "bounds_px": (float((x0 + cols[0]) * cell), float((y0 + rows[0]) * cell),
+                          float((x0 + cols[-1] + 1) * cell), float((y0 + rows[-1] + 1) * cell)),
+            "anchor_px": (float((x0 + anchor_x + 0.5) * cell), float((y0 + anchor_y + 0.5) * cell)),
+        })
+    rooms.sort(key=lambda room: -room["area_px"])
+    return rooms
+
+
+def _room_point_px(data, scale_factor):
+    # Where a room entry sits in the image: its OCR label, its selection's centre or its position
+    if "ocr_bbox_center_pixels" in data:
+        return data["ocr_bbox_center_pixels"]
+    if "pixel_bounds" in data:
+        x1, y1, x2, y2 = data["pixel_bounds"]
+        return ((x1 + x2) / 2, (y1 + y2) / 2)
+    if "position" in data and scale_factor > 0:
+        return (data["position"][0] * scale_factor, data["position"][1] * scale_factor)
+    return None
+
+
+def assign_rooms(room_dimensions, room_positions, segmented_rooms, scale_factor):
+    """Give each room entry the polygon of the segmented room it lies in and add the unlabelled ones.
+
+    Updates room_dimensions / room_positions in place, like extract_room_descriptions. Every room whose label,
+    selection or position lies in a region takes that region's polygon, including rooms that got one on an
+    earlier pass, so processing a plan again finds its own "Room N" entries instead of adding them once more.
+    A region goes to one room only; a room in no region keeps the polygon it has. Unlabelled regions become
+    "Room", "Room 2", ... of type "Other", sized by their bounding box and positioned at their anchor point.
+    """
+    current_scale = scale_factor if scale_factor > 0 else 1.0
+    contours = [np.asarray(room["polygon_px"], dtype=np.float32).reshape(-1, 1, 2) for room in segmented_rooms]
+    claimed = set()
+    for data in room_dimensions.values():
+        point = _room_point_px(data, scale_factor)
+        if point is None: continue
+        for k, room in enumerate(segmented_rooms):
+            if k in claimed: continue
+            x0, y0, x1, y1 = room["bounds_px"]
+            if not (x0 <= point[0] <= x1 and y0 <= point[1] <= y1): continue
+            if cv2.pointPolygonTest(contours[k], (float(point[0]), float(point[1])), False) >= 0:
+                data["polygon_px"] = room["polygon_px"]
+                claimed.add(k)
+                break
+    for k, room in enumerate(segmented_rooms):
+        if k in claimed: continue
+        x0, y0, x1, y1 = room["bounds_px"]
+        width_ft, length_ft = (x1 - x0) / current_scale, (y1 - y0) / current_scale
+        pos_x_ft, pos_y_ft = room["anchor_px"][0] / current_scale, room["anchor_px"][1] / current_scale
+        counter = 1; name = "Room"
+        while name in room_dimensions:
+            counter += 1; name = f"Room {counter}"
+        room_dimensions[name] = {
+            "width": width_ft, "length": length_ft, "dim_str": f"{width_ft:.1f}' x {length_ft:.1f}'",
+            "area": polygon_area(room["polygon_px"]) / current_scale ** 2,
+            "type": "Other", "position": (pos_x_ft, pos_y_ft),
+            "polygon_px": room["polygon_px"]
+        }
+        room_positions[name] = {
+            "center_x": pos_x_ft, "center_y": pos_y_ft,
+            "min_x": x0 / current_scale, "max_x": x1 / current_scale,
+            "min_y": y0 / current_scale, "max_y": y1 / current_scale
+        }
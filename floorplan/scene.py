@@ -0,0 +1,598 @@
+"""3D scene assembly: walls, openings, curved walls, furniture, floor and ceiling.
+
+Geometry is collected per material (colour, opacity) as NumPy arrays and is
+only turned into PyVista meshes at the end, one merged PolyData per material.
+A plan with hundreds of walls and openings is therefore drawn with a handful
+of VTK actors instead of one actor per box, which keeps shadows and SSAO
+interactive. PyVista is imported lazily, so the package stays usable without it.
+"""
+
+import copy
+import hashlib
+import json
+import math
+
+import numpy as np
+
+from floorplan.profiling import timed
+from floorplan.spatial import geometry_bounds
+
+DEFAULT_MATERIALS = {
+    "wall": "#C19A6B",
+    "floor": "#D2B48C",
+    "ceiling": "#F5F5DC",
+    "door_frame": "#A0522D", "door_panel": "#8B4513",
+    "window_frame": "#A0522D", "window_glass": "#ADD8E6",
+    "furniture": {
+        "bed": "#4682B4", "nightstand": "#8B4513", "counter": "#D3D3D3", "island": "#A9A9A9",
+        "sofa": "#6B8E23", "table": "#8B4513", "chair": "#CD853F", "bathtub": "#B0E0E6",
+        "toilet": "#F0F8FF", "sink": "#F5F5F5", "wardrobe": "#8B4513", "tv_stand": "#A9A9A9",
+        "bookshelf": "#8B4513", "desk": "#D3D3D3", "oven": "#696969", "refrigerator": "#FFFFFF",
+    }
+}
+
+GLASS_OPACITY = 0.5
+CEILING_OPACITY = 0.7
+FLOOR_CELL_FT = 0.25 # Height of the bands that floors following segmented room outlines are cut into
+MAX_FLOOR_CELLS = 2048 # ... made taller for very large rooms, so one floor has at most this many bands
+MITER_LIMIT = 4.0 # Longest miter offset at a sharp curved-wall joint, in half thicknesses
+
+# Faces of a prism whose base corners 0-3 are counter-clockwise seen from above and whose top corners are 4-7
+_PRISM_FACES = np.array([
+    [0, 3, 2, 1], # Bottom
+    [4, 5, 6, 7], # Top
+    [0, 1, 5, 4],
+    [1, 2, 6, 5],
+    [2, 3, 7, 6],
+    [3, 0, 4, 7],
+])
+
+
+def default_materials():
+    return copy.deepcopy(DEFAULT_MATERIALS)
+
+
+def _material_key(color, opacity):
+    return (tuple(color) if isinstance(color, (list, tuple)) else color, float(opacity))
+
+
+class SceneBuilder:
+    """Collects boxes and free-form polygons per (colour, opacity) and merges them into one mesh each."""
+
+    def __init__(self):
+        self._prisms = {} # material -> list of [x0, y0, ..., x3, y3, z0, z1] rows
+        self._polygons = {} # material -> list of (points (N, 3), faces (M, K))
+
+    def add_prism(self, corners_xy, z0, z1, color, opacity=1.0):
+        # Vertical extrusion of a quadrilateral (any winding) from z0 to z1
+        corners = np.asarray(corners_xy, dtype=np.float64).reshape(4, 2)
+        self._prisms.setdefault(_material_key(color, opacity), []).append(
+            [*corners.ravel(), z0, z1])
+
+    def add_segment(self, p1, p2, z0, height, thickness, color, opacity=1.0):
+        # Straight wall slab of the given thickness centred on p1 -> p2
+        dx, dy = p2[0] - p1[0], p2[1] - p1[1]
+        length = math.hypot(dx, dy)
+        if length < 1e-3: return
+        off_x, off_y = -dy / length * thickness / 2.0, dx / length * thickness / 2.0
+        self.add_prism([(p1[0] - off_x, p1[1] - off_y), (p1[0] + off_x, p1[1] + off_y),
+                        (p2[0] + off_x, p2[1] + off_y), (p2[0] - off_x, p2[1] - off_y)],
+                       z0, z0 + height, color, opacity)
+
+    def add_oriented_box(self, origin_xy, angle_rad, center, lengths, color, opacity=1.0):
+        # Box with the given local centre and (x, y, z) lengths, rotated about z by angle_rad and moved to origin_xy
+        cos_a, sin_a = math.cos(angle_rad), math.sin(angle_rad)
+        half_x, half_y = lengths[0] / 2.0, lengths[1] / 2.0
+        corners = []
+        for lx, ly in ((-half_x, -half_y), (half_x, -half_y), (half_x, half_y), (-half_x, half_y)):
+            lx += center[0]; ly += center[1]
+            corners.append((origin_xy[0] + lx * cos_a - ly * sin_a, origin_xy[1] + lx * sin_a + ly * cos_a))
+        self.add_prism(corners, center[2] - lengths[2] / 2.0, center[2] + lengths[2] / 2.0, color, opacity)
+
+    def add_box(self, bounds, color, opacity=1.0):
+        # Axis-aligned box, bounds as (x_min, x_max, y_min, y_max, z_min, z_max) like pv.Box
+        x_min, x_max, y_min, y_max, z_min, z_max = bounds
+        self.add_prism([(x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)], z_min, z_max, color, opacity)
+
+    def add_polygons(self, points, faces, color, opacity=1.0):
+        # Free-form surface: points (N, 3) and faces (M, K) indexing into points
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        faces = np.asarray(faces, dtype=np.int64)
+        if len(points) == 0 or faces.size == 0: return
+        self._polygons.setdefault(_material_key(color, opacity), []).append((points, faces.reshape(len(faces), -1)))
+
+    @property
+    def n_parts(self):
+        return sum(len(rows) for rows in self._prisms.values()) + sum(len(p) for p in self._polygons.values())
+
+    def merged(self):
+        """Return [(points (N, 3), faces (VTK flat cell array), color, opacity)], one entry per material."""
+        result = []
+        for material in list(dict.fromkeys([*self._prisms, *self._polygons])):
+            point_blocks, face_blocks, n_points = [], [], 0
+            rows = self._prisms.get(material)
+            if rows:
+                points, faces = _prism_arrays(np.array(rows, dtype=np.float64))
+                point_blocks.append(points); face_blocks.append(faces)
+                n_points += len(points)
+            for points, faces in self._polygons.get(material, ()):
+                point_blocks.append(points)
+                face_blocks.append(np.hstack([np.full((len(faces), 1), faces.shape[1]), faces + n_points]).ravel())
+                n_points += len(points)
+            color, opacity = material
+            result.append((np.concatenate(point_blocks), np.concatenate(face_blocks), color, opacity))
+        return result
+
+    def to_polydata(self):
+        import pyvista as pv
+        return [(pv.PolyData(points, faces), color, opacity) for points, faces, color, opacity in self.merged()]
+
+    def add_to_plotter(self, plotter, **kwargs):
+        for mesh, color, opacity in self.to_polydata():
+            plotter.add_mesh(mesh, color=color, opacity=opacity, smooth_shading=False, **kwargs)
+
+
+class StoredScene(SceneBuilder):
+    """A scene restored from the output of SceneBuilder.merged(), e.g. from a project's stored meshes.
+
+    key is the scene_key of the inputs it was built from; nothing can be added to it.
+    """
+
+    def __init__(self, meshes, n_parts, key=None):
+        super().__init__()
+        self._meshes = list(meshes)
+        self._n_parts = n_parts
+        self.key = key
+
+    @classmethod
+    def from_scene(cls, scene, key=None):
+        return scene if isinstance(scene, StoredScene) else cls(scene.merged(), scene.n_parts, key)
+
+    def add_prism(self, *args, **kwargs):
+        raise TypeError("A StoredScene cannot be modified")
+
+    def add_polygons(self, *args, **kwargs):
+        raise TypeError("A StoredScene cannot be modified")
+
+    @property
+    def n_parts(self):
+        return self._n_parts
+
+    def merged(self):
+        return self._meshes
+
+    def as_artifact(self):
+        # The "scene" entry of floorplan.project.save_project's artifacts
+        return {"key": self.key, "n_parts": self._n_parts, "meshes": self._meshes}
+
+
+def _canonical(value):
+    # Numbers as floats and sequences as lists: detected coordinates mix 1426 and 1426.0, NumPy and Python types,
+    # and a saved project gives them back as either, so only their values may count
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    return value
+
+
+def scene_key(walls, curved_walls, room_dimensions, scale_factor, height_ft, wall_thickness_ft, materials=None):
+    """Digest of everything build_scene depends on; stored meshes are only reused while it matches."""
+    inputs = [walls, curved_walls, room_dimensions, scale_factor, height_ft, wall_thickness_ft,
+              materials or DEFAULT_MATERIALS]
+    text = json.dumps(_canonical(inputs), sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _prism_arrays(rows):
+    # rows: (N, 10) [x0, y0, ..., x3, y3, z0, z1] -> points (8N, 3) and a flat quad cell array (6N * 5)
+    corners = rows[:, :8].reshape(-1, 4, 2)
+    # Shoelace sign; clockwise quads are reversed so every face normal points outwards
+    x, y = corners[:, :, 0], corners[:, :, 1]
+    clockwise = (x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y).sum(axis=1) < 0
+    corners[clockwise] = corners[clockwise][:, ::-1]
+
+    points = np.empty((len(rows), 8, 3))
+    points[:, :4, :2] = corners
+    points[:, 4:, :2] = corners
+    points[:, :4, 2] = rows[:, 8:9]
+    points[:, 4:, 2] = rows[:, 9:10]
+
+    faces = _PRISM_FACES[None, :, :] + 8 * np.arange(len(rows))[:, None, None]
+    cells = np.concatenate([np.full(faces.shape[:2] + (1,), 4), faces], axis=2)
+    return points.reshape(-1, 3), cells.ravel()
+
+
+def add_door(scene, center_pos_2d_ft, width_ft, height_ft, wall_thickness_ft, angle_rad_wall, materials):
+    panel_color = materials["door_panel"]
+    frame_color = materials["door_frame"]
+    door_panel_thickness = 0.15
+    frame_element_thickness = 0.2
+
+    panel_width = width_ft - 2 * frame_element_thickness
+    panel_height = height_ft - frame_element_thickness
+
+    if panel_width <= 0 or panel_height <= 0:
+        scene.add_oriented_box(center_pos_2d_ft, angle_rad_wall, (0, 0, height_ft/2),
+                               (width_ft, wall_thickness_ft*0.8, height_ft), panel_color)
+        return
+
+    scene.add_oriented_box(center_pos_2d_ft, angle_rad_wall, (0, 0, panel_height / 2),
+                           (panel_width, door_panel_thickness, panel_height), panel_color)
+
+    frame_depth = wall_thickness_ft * 0.8
+    side_height = height_ft - frame_element_thickness
+    frame_parts = [
+        ((0, 0, height_ft - frame_element_thickness / 2), (width_ft, frame_depth, frame_element_thickness)), # Top
+        ((-width_ft/2 + frame_element_thickness/2, 0, side_height/2), (frame_element_thickness, frame_depth, side_height)),
+        ((width_ft/2 - frame_element_thickness/2, 0, side_height/2), (frame_element_thickness, frame_depth, side_height)),
+    ]
+    for center, lengths in frame_parts:
+        scene.add_oriented_box(center_pos_2d_ft, angle_rad_wall, center, lengths, frame_color)
+
+
+def add_window(scene, center_pos_2d_ft, width_ft, height_ft, sill_ft, wall_thickness_ft, angle_rad_wall, materials):
+    glass_color = materials["window_glass"]
+    frame_color = materials["window_frame"]
+    glass_thickness = 0.05
+    frame_element_thickness = 0.15
+
+    glass_width = width_ft - 2 * frame_element_thickness
+    glass_height = height_ft - 2 * frame_element_thickness
+
+    if glass_width <=0 or glass_height <=0:
+        scene.add_oriented_box(center_pos_2d_ft, angle_rad_wall, (0, 0, sill_ft + height_ft/2),
+                               (width_ft, wall_thickness_ft*0.7, height_ft), glass_color, GLASS_OPACITY)
+        return
+
+    glass_pane_center_z = sill_ft + frame_element_thickness + glass_height / 2
+    scene.add_oriented_box(center_pos_2d_ft, angle_rad_wall, (0, 0, glass_pane_center_z),
+                           (glass_width, glass_thickness, glass_height), glass_color, GLASS_OPACITY)
+
+    frame_depth = wall_thickness_ft * 0.7
+    side_height = height_ft - 2 * frame_element_thickness
+    side_center_z = sill_ft + frame_element_thickness + side_height/2
+    frame_parts = [
+        ((0, 0, sill_ft + height_ft - frame_element_thickness/2), (width_ft, frame_depth, frame_element_thickness)),
+        ((0, 0, sill_ft + frame_element_thickness/2), (width_ft, frame_depth, frame_element_thickness)),
+        ((-width_ft/2 + frame_element_thickness/2, 0, side_center_z), (frame_element_thickness, frame_depth, side_height)),
+        ((width_ft/2 - frame_element_thickness/2, 0, side_center_z), (frame_element_thickness, frame_depth, side_height)),
+    ]
+    for center, lengths in frame_parts:
+        scene.add_oriented_box(center_pos_2d_ft, angle_rad_wall, center, lengths, frame_color)
+
+
+def add_wall_with_openings(scene, wall_data_px, overall_height_ft, thickness_ft, scale_factor, materials):
+    start_px_orig = np.array(wall_data_px["start"])
+    end_px_orig = np.array(wall_data_px["end"])
+    wall_length_px_orig = wall_data_px["length"]
+
+    if wall_length_px_orig < 1e-6 or scale_factor < 1e-6: return
+
+    wall_unit_vec_px = (end_px_orig - start_px_orig) / wall_length_px_orig
+    wall_color = materials["wall"]
+
+    processed_openings = []
+    for op_px_data in wall_data_px.get("openings", []):
+        center_pos_on_wall_px = op_px_data["position_on_wall"]
+        width_px = op_px_data["width_px"]
+
+        op_start_dist_px = max(0, center_pos_on_wall_px - width_px / 2.0)
+        op_end_dist_px = min(wall_length_px_orig, center_pos_on_wall_px + width_px / 2.0)
+        if op_end_dist_px <= op_start_dist_px + 1e-3: continue
+
+        processed_openings.append({
+            "start_dist_px": op_start_dist_px,
+            "end_dist_px": op_end_dist_px,
+            "width_px": op_end_dist_px - op_start_dist_px,
+            "height_px": op_px_data["height_px"],
+            "sill_px": op_px_data["sill_px"],
+            "type": op_px_data["type"]
+        })
+    processed_openings.sort(key=lambda o: o["start_dist_px"])
+
+    wall_angle_rad = math.atan2(wall_unit_vec_px[1], wall_unit_vec_px[0])
+    current_wall_pos_px = 0.0
+
+    for op in processed_openings:
+        op_s_px = op["start_dist_px"]
+        op_e_px = op["end_dist_px"]
+
+        op_width_ft = op["width_px"] / scale_factor
+        op_height_ft = op["height_px"] / scale_factor
+        op_sill_ft = op["sill_px"] / scale_factor
+
+        if op_s_px > current_wall_pos_px + 1e-3:
+            seg_start_pt_px = start_px_orig + wall_unit_vec_px * current_wall_pos_px
+            seg_end_pt_px = start_px_orig + wall_unit_vec_px * op_s_px
+            scene.add_segment(seg_start_pt_px / scale_factor, seg_end_pt_px / scale_factor,
+                              0, overall_height_ft, thickness_ft, wall_color)
+
+        op_seg_start_ft = (start_px_orig + wall_unit_vec_px * op_s_px) / scale_factor
+        op_seg_end_ft = (start_px_orig + wall_unit_vec_px * op_e_px) / scale_factor
+
+        if op_sill_ft > 1e-3:
+            scene.add_segment(op_seg_start_ft, op_seg_end_ft, 0, op_sill_ft, thickness_ft, wall_color)
+
+        header_start_z_ft = op_sill_ft + op_height_ft
+        if header_start_z_ft < overall_height_ft - 1e-3:
+            scene.add_segment(op_seg_start_ft, op_seg_end_ft, header_start_z_ft,
+                              overall_height_ft - header_start_z_ft, thickness_ft, wall_color)
+
+        op_center_pt_ft = (start_px_orig + wall_unit_vec_px * (op_s_px + op["width_px"] / 2.0)) / scale_factor
+
+        if op["type"] == "door":
+            add_door(scene, op_center_pt_ft, op_width_ft, op_height_ft, thickness_ft, wall_angle_rad, materials)
+        elif op["type"] == "window":
+            add_window(scene, op_center_pt_ft, op_width_ft, op_height_ft, op_sill_ft, thickness_ft,
+                       wall_angle_rad, materials)
+
+        current_wall_pos_px = op_e_px
+
+    if current_wall_pos_px < wall_length_px_orig - 1e-3 :
+        seg_start_pt_px = start_px_orig + wall_unit_vec_px * current_wall_pos_px
+        scene.add_segment(seg_start_pt_px / scale_factor, end_px_orig / scale_factor,
+                          0, overall_height_ft, thickness_ft, wall_color)
+
+
+def _sweep_arrays(paths, height_ft, thickness_ft):
+    """Closed wall solids swept along 2D polylines, all paths in one vectorized pass.
+
+    Returns points (4M, 3) laid out as [side 1 base, side 2 base, side 1 top, side 2 top] and quad faces (F, 4)
+    with outward normals: two sides, top and bottom per segment plus an end cap at each end of every path.
+    Interior joints use miter offsets (capped at MITER_LIMIT times the half thickness) so the sides stay
+    parallel to the path; consecutive duplicate points are dropped and paths shorter than two points skipped.
+    """
+    arrays = [np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in paths]
+    if not arrays:
+        return np.empty((0, 3)), np.empty((0, 4), dtype=np.int64)
+    points = np.concatenate(arrays)
+    path_ids = np.repeat(np.arange(len(arrays)), [len(a) for a in arrays])
+    repeated = np.zeros(len(points), dtype=bool)
+    repeated[1:] = (path_ids[1:] == path_ids[:-1]) & np.all(np.abs(np.diff(points, axis=0)) < 1e-9, axis=1)
+    points, path_ids = points[~repeated], path_ids[~repeated]
+    counts = np.bincount(path_ids, minlength=len(arrays))
+    keep = counts[path_ids] >= 2
+    points, path_ids = points[keep], path_ids[keep]
+    n = len(points)
+    if n == 0:
+        return np.empty((0, 3)), np.empty((0, 4), dtype=np.int64)
+
+    # Segment k joins points k and k + 1 when both belong to the same path
+    segment_ok = path_ids[1:] == path_ids[:-1]
+    directions = np.diff(points, axis=0)
+    directions /= np.maximum(np.linalg.norm(directions, axis=1, keepdims=True), 1e-12)
+    normals = np.stack([-directions[:, 1], directions[:, 0]], axis=1) # Left of the direction of travel
+
+    has_next = np.append(segment_ok, False)
+    has_prev = np.insert(segment_ok, 0, False)
+    normal_next = np.zeros((n, 2)); normal_next[:-1][segment_ok] = normals[segment_ok]
+    normal_prev = np.zeros((n, 2)); normal_prev[1:][segment_ok] = normals[segment_ok]
+    miter = normal_prev + normal_next
+    miter_len = np.linalg.norm(miter, axis=1)
+    joint = has_prev & has_next & (miter_len > 1e-6) # A full reversal has no miter and keeps the next normal
+    offsets = np.where(has_next[:, None], normal_next, normal_prev)
+    miter_dirs = miter[joint] / miter_len[joint, None]
+    cos_half = np.einsum("ij,ij->i", miter_dirs, normal_next[joint])
+    offsets[joint] = miter_dirs * np.minimum(1.0 / np.maximum(cos_half, 1e-6), MITER_LIMIT)[:, None]
+    offsets *= thickness_ft / 2.0
+
+    base = np.zeros((4 * n, 3))
+    base[:n, :2] = points - offsets
+    base[n:2 * n, :2] = points + offsets
+    base[2 * n:] = base[:2 * n]
+    base[2 * n:, 2] = height_ft
+
+    i = np.flatnonzero(segment_ok)
+    j = i + 1
+    b1, b2, t1, t2 = 0, n, 2 * n, 3 * n
+    segment_faces = np.concatenate([
+        np.stack([b1 + i, b1 + j, t1 + j, t1 + i], axis=1), # Side 1 (right of travel)
+        np.stack([b2 + j, b2 + i, t2 + i, t2 + j], axis=1), # Side 2 (left of travel)
+        np.stack([t1 + i, t1 + j, t2 + j, t2 + i], axis=1), # Top
+        np.stack([b1 + i, b2 + i, b2 + j, b1 + j], axis=1), # Bottom
+    ])
+    first = np.flatnonzero(~has_prev)
+    last = np.flatnonzero(~has_next)
+    cap_faces = np.concatenate([
+        np.stack([b2 + first, b1 + first, t1 + first, t2 + first], axis=1),
+        np.stack([b1 + last, b2 + last, t2 + last, t1 + last], axis=1),
+    ])
+    return base, np.concatenate([segment_faces, cap_faces])
+
+
+def add_curved_walls(scene, paths_ft, height_ft, thickness_ft, color):
+    # All curved walls in one sweep and one polygon block
+    points, faces = _sweep_arrays(paths_ft, height_ft, thickness_ft)
+    scene.add_polygons(points, faces, color)
+
+
+def add_curved_wall(scene, points_2d_ft, height_ft, thickness_ft, color):
+    add_curved_walls(scene, [points_2d_ft], height_ft, thickness_ft, color)
+
+
+def add_furniture(scene, room_type, room_bounds_ft, materials):
+    x_min, x_max, y_min, y_max = room_bounds_ft
+    width = x_max - x_min; length = y_max - y_min
+    center_x, center_y = x_min + width/2, y_min + length/2
+
+    if width <= 1e-3 or length <= 1e-3: return
+    furniture_color = materials["furniture"]
+
+    if room_type == "Bedroom":
+        bed_w, bed_l, bed_h = min(width * 0.6, 6.0), min(length * 0.7, 7.0), 2.0
+        if bed_w > 1.0 and bed_l > 1.5 :
+            if width < length:
+                bed_x_pos, bed_y_pos = center_x, y_min + bed_l/2 + 0.5
+            else:
+                bed_w, bed_l = bed_l, bed_w
+                bed_x_pos, bed_y_pos = x_min + bed_w/2 + 0.5, center_y
+
+            scene.add_box([bed_x_pos - bed_w/2, bed_x_pos + bed_w/2,
+                           bed_y_pos - bed_l/2, bed_y_pos + bed_l/2,
+                           0, bed_h], furniture_color["bed"])
+
+    elif room_type == "Kitchen":
+        counter_h, counter_d = 2.9, 2.0
+        if length > counter_d + 0.5 :
+            scene.add_box([x_min, x_max, y_max - counter_d, y_max, 0, counter_h], furniture_color["counter"])
+        if width > counter_d + 0.5 :
+            y_extent_for_side_counter = y_max - (counter_d if length > counter_d + 0.5 else 0)
+            if y_extent_for_side_counter > y_min:
+                scene.add_box([x_max - counter_d, x_max, y_min, y_extent_for_side_counter, 0, counter_h],
+                              furniture_color["counter"])
+        if width > 7 and length > 7:
+            island_w, island_l = min(width*0.3, 4), min(length*0.25, 3)
+            if island_w > 1.5 and island_l > 1.5:
+                scene.add_box([center_x - island_w/2, center_x + island_w/2,
+                               center_y - island_l/2, center_y + island_l/2,
+                               0, counter_h], furniture_color["island"])
+
+    elif room_type == "Living Room":
+        sofa_max_w, sofa_max_d, sofa_h = min(width * 0.7, 7), min(length*0.35, 3.0), 2.5
+        if sofa_max_w > 2.0 and sofa_max_d > 1.5:
+            sofa_actual_w, sofa_actual_d = sofa_max_w, sofa_max_d
+            sofa_x_pos, sofa_y_pos = center_x, y_min + sofa_actual_d/2 + 0.5
+
+            if length > width * 1.1:
+                sofa_actual_w = sofa_max_d; sofa_actual_d = sofa_max_w
+                sofa_x_pos = x_min + sofa_actual_d/2 + 0.5; sofa_y_pos = center_y
+
+            scene.add_box([sofa_x_pos - sofa_actual_w/2, sofa_x_pos + sofa_actual_w/2,
+                           sofa_y_pos - sofa_actual_d/2, sofa_y_pos + sofa_actual_d/2,
+                           0, sofa_h], furniture_color["sofa"])
+
+
+def _add_horizontal_plane(scene, center_x, center_y, z, i_size, j_size, color, opacity=1.0, facing_up=True):
+    x0, x1 = center_x - i_size / 2, center_x + i_size / 2
+    y0, y1 = center_y - j_size / 2, center_y + j_size / 2
+    face = [0, 1, 2, 3] if facing_up else [3, 2, 1, 0]
+    scene.add_polygons([(x0, y0, z), (x1, y0, z), (x1, y1, z), (x0, y1, z)], [face], color, opacity)
+
+
+def build_scene(walls, curved_walls, room_dimensions, scale_factor, height_ft, wall_thickness_ft, materials=None,
+                profile=None, index=None):
+    """Assemble the whole model (floor, ceiling, furniture, walls with openings, curved walls) into a SceneBuilder.
+
+    profile (floorplan.profiling.Profile) gets one "scene/..." stage per builder. index, a
+    floorplan.spatial.SpatialIndex over the same walls, supplies the plan bounds it keeps up to date as walls are
+    added, so no extra pass over the points is needed.
+    """
+    materials = materials or DEFAULT_MATERIALS
+    scene = SceneBuilder()
+    with timed(profile, "scene/floor_ceiling"):
+        bounds_px = index.bounds(("wall", "curve")) if index is not None else geometry_bounds(walls, curved_walls)
+        _add_floor_and_ceiling(scene, bounds_px, room_dimensions, scale_factor, height_ft, materials)
+
+    with timed(profile, "scene/furniture"):
+        for data in room_dimensions.values():
+            if "position" in data and "width" in data and "length" in data:
+                width_ft = data["width"]; length_ft = data["length"]
+                center_x_ft, center_y_ft = data["position"]
+                if width_ft <= 0 or length_ft <= 0 or width_ft * length_ft <= 10: continue
+                room_bounds_ft = (center_x_ft - width_ft / 2.0, center_x_ft + width_ft / 2.0,
+                                  center_y_ft - length_ft / 2.0, center_y_ft + length_ft / 2.0)
+                add_furniture(scene, data.get("type", "Other"), room_bounds_ft, materials)
+
+    if scale_factor > 0:
+        with timed(profile, "scene/walls"):
+            for wall_data_px in walls:
+                add_wall_with_openings(scene, wall_data_px, height_ft, wall_thickness_ft, scale_factor, materials)
+        with timed(profile, "scene/curved_walls"):
+            paths_ft = [np.asarray(curve_data_px["points"], dtype=np.float64).reshape(-1, 2) / scale_factor
+                        for curve_data_px in curved_walls]
+            add_curved_walls(scene, paths_ft, height_ft, wall_thickness_ft, materials["wall"])
+    return scene
+
+
+def _polygon_rects(points_ft, cell_ft):
+    # The polygon (any winding, holes joined by cuts) cut into horizontal bands cell_ft high. Each band's spans
+    # inside the polygon (even-odd rule, at the band's centre line) become rectangles, merged downwards while the
+    # span stays the same: (K, 4) rows of x0, y0, x1, y1 in feet. Always valid quads, unlike triangulating an
+    # outline that simplification may have made self-touching, and exact along x
+    points = np.asarray(points_ft, dtype=np.float64).reshape(-1, 2)
+    y_min, y_max = points[:, 1].min(), points[:, 1].max()
+    cell_ft = max(cell_ft, (y_max - y_min) / MAX_FLOOR_CELLS)
+    n_rows = max(1, int(np.ceil((y_max - y_min) / cell_ft)))
+    a, b = points, np.roll(points, -1, axis=0)
+    a, b = a[a[:, 1] != b[:, 1]], b[a[:, 1] != b[:, 1]]
+    # Rows whose centre line y_min + (row + 0.5) * cell_ft each edge crosses (half-open in y)
+    low, high = np.minimum(a[:, 1], b[:, 1]), np.maximum(a[:, 1], b[:, 1])
+    first = np.ceil((low - y_min) / cell_ft - 0.5).astype(int)
+    last = np.ceil((high - y_min) / cell_ft - 0.5).astype(int)
+    counts = np.maximum(last - first, 0)
+    edge = np.repeat(np.arange(len(a)), counts)
+    rows = first[edge] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    y = y_min + (rows + 0.5) * cell_ft
+    xs = a[edge, 0] + (y - a[edge, 1]) * (b[edge, 0] - a[edge, 0]) / (b[edge, 1] - a[edge, 1])
+    order = np.lexsort((xs, rows))
+    rows, xs = rows[order], np.round(xs[order], 6)
+    rects, open_spans = [], {} # (x0, x1) span -> first row
+    spans_by_row = {}
+    for k in range(0, len(rows) - 1, 2):
+        if rows[k] == rows[k + 1] and xs[k + 1] > xs[k]:
+            spans_by_row.setdefault(int(rows[k]), set()).add((float(xs[k]), float(xs[k + 1])))
+    for row in range(n_rows + 1):
+        spans = spans_by_row.get(row, set())
+        for span in [span for span in open_spans if span not in spans]:
+            rects.append((span[0], y_min + open_spans.pop(span) * cell_ft, span[1], y_min + row * cell_ft))
+        for span in spans:
+            open_spans.setdefault(span, row)
+    return np.array(rects, dtype=np.float64).reshape(-1, 4)
+
+
+def _add_room_floors(scene, polygons_px, scale_factor, height_ft, materials):
+    # Floor and ceiling shaped like the segmented rooms; False when there is nothing to add
+    rects = [_polygon_rects(np.asarray(polygon, dtype=np.float64) / scale_factor, FLOOR_CELL_FT)
+             for polygon in polygons_px if len(polygon) >= 3]
+    rects = np.concatenate(rects) if rects else np.zeros((0, 4))
+    if len(rects) == 0: return False
+    x0, y0, x1, y1 = rects.T
+    corners = np.stack([np.column_stack(c) for c in ((x0, y0), (x1, y0), (x1, y1), (x0, y1))], axis=1).reshape(-1, 2)
+    faces = np.arange(len(corners)).reshape(-1, 4)
+    scene.add_polygons(np.column_stack([corners, np.full(len(corners), -0.05)]), faces, materials["floor"])
+    scene.add_polygons(np.column_stack([corners, np.full(len(corners), height_ft + 0.05)]), faces[:, ::-1],
+                       materials["ceiling"], CEILING_OPACITY)
+    return True
+
+
+def _add_floor_and_ceiling(scene, bounds_px, room_dimensions, scale_factor, height_ft, materials):
+    # Follows the segmented rooms (floorplan.rooms) when there are any; otherwise one plane sized to the
+    # detected geometry (bounds_px, in pixels) or else the rooms, plus a margin
+    polygons_px = [data["polygon_px"] for data in room_dimensions.values() if data.get("polygon_px")]
+    if polygons_px and scale_factor > 0 and _add_room_floors(scene, polygons_px, scale_factor, height_ft, materials):
+        return
+    all_points_ft = []
+    if scale_factor > 0 and bounds_px is not None:
+        all_points_ft.append((bounds_px[0] / scale_factor, bounds_px[1] / scale_factor))
+        all_points_ft.append((bounds_px[2] / scale_factor, bounds_px[3] / scale_factor))
+
+    if not all_points_ft and room_dimensions:
+        for data in room_dimensions.values():
+            if "position" in data and "width" in data and "length" in data:
+                cx, cy = data["position"]
+                w, l = data["width"], data["length"]
+                all_points_ft.append((cx - w/2, cy - l/2))
+                all_points_ft.append((cx + w/2, cy + l/2))
+
+    if not all_points_ft:
+        _add_horizontal_plane(scene, 0, 0, -0.1, 50, 50, materials["floor"])
+    else:
+        all_points_ft_np = np.array(all_points_ft)
+        min_coord_x, min_coord_y = all_points_ft_np[:, :2].min(axis=0)
+        max_coord_x, max_coord_y = all_points_ft_np[:, :2].max(axis=0)
+
+        floor_padding = max(5.0, height_ft * 0.5)
+        floor_center_x = (min_coord_x + max_coord_x) / 2
+        floor_center_y = (min_coord_y + max_coord_y) / 2
+        floor_i_size = (max_coord_x - min_coord_x) + 2 * floor_padding
+        floor_j_size = (max_coord_y - min_coord_y) + 2 * floor_padding
+
+        _add_horizontal_plane(scene, floor_center_x, floor_center_y, -0.05, floor_i_size, floor_j_size,
+                              materials["floor"])
+        _add_horizontal_plane(scene, floor_center_x, floor_center_y, height_ft + 0.05, floor_i_size, floor_j_size,
+                              materials["ceiling"], CEILING_OPACITY, facing_up=False)
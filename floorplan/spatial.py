@@ -0,0 +1,211 @@
+"""Uniform-grid spatial index over the geometry of one plan.
+
+Walls (segments), curved walls (polylines), room rectangles and OCR text
+boxes are registered in pixel coordinates with their bounding boxes. Every
+box is listed in the grid cells it overlaps, so "text in this rectangle" and
+"walls near this point" only look at nearby items instead of scanning the
+whole plan. The bounds of each kind are kept up to date as items are added.
+Items can be added and removed after the index is built; a room edited in
+the GUI does not require a rebuild.
+"""
+
+import math
+
+import numpy as np
+
+KINDS = ("wall", "curve", "room", "text")
+
+
+def room_rect_px(data, scale_factor):
+    # Pixel rectangle of a room entry: its selection, its segmented outline, else position and size in feet;
+    # None when unknown
+    if "pixel_bounds" in data:
+        x1, y1, x2, y2 = data["pixel_bounds"]
+        return (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+    if data.get("polygon_px"):
+        points = np.asarray(data["polygon_px"], dtype=np.float64).reshape(-1, 2)
+        return (*points.min(axis=0), *points.max(axis=0))
+    if "position" in data and data.get("width", 0) > 0 and data.get("length", 0) > 0 and scale_factor > 0:
+        cx, cy = data["position"]
+        half_w, half_l = data["width"] / 2.0, data["length"] / 2.0
+        return ((cx - half_w) * scale_factor, (cy - half_l) * scale_factor,
+                (cx + half_w) * scale_factor, (cy + half_l) * scale_factor)
+    return None
+
+
+def geometry_bounds(walls, curved_walls):
+    """(x_min, y_min, x_max, y_max) over all wall end points and curve points, or None."""
+    blocks = []
+    if walls:
+        blocks.append(np.array([(*w["start"], *w["end"]) for w in walls], dtype=np.float64).reshape(-1, 2))
+    blocks.extend(np.asarray(c["points"], dtype=np.float64).reshape(-1, 2) for c in curved_walls if len(c["points"]))
+    if not blocks:
+        return None
+    points = np.concatenate(blocks)
+    return (*points.min(axis=0), *points.max(axis=0))
+
+
+def _segment_distances(px, py, segments):
+    # Distances from (px, py) to each segment row [x1, y1, x2, y2]
+    start, end = segments[:, :2], segments[:, 2:]
+    direction = end - start
+    length_sq = np.maximum((direction ** 2).sum(axis=1), 1e-12)
+    t = np.clip(((px - start[:, 0]) * direction[:, 0] + (py - start[:, 1]) * direction[:, 1]) / length_sq, 0.0, 1.0)
+    closest = start + direction * t[:, None]
+    return np.hypot(closest[:, 0] - px, closest[:, 1] - py)
+
+
+class SpatialIndex:
+    def __init__(self, cell_size=128.0):
+        self.cell_size = float(cell_size)
+        self.cells = {} # (ix, iy) -> list of item ids
+        self.kinds = []
+        self.keys = []
+        self.boxes = [] # (x_min, y_min, x_max, y_max) per item
+        self.shapes = [] # Segment/polyline points (N, 2) for walls and curves, else None
+        self.removed = set()
+        self._ids_by_key = {} # (kind, key) -> item id
+        self._boxes_np = None
+        self._bounds = {} # kind -> [x_min, y_min, x_max, y_max] of its live items
+        self._stale_bounds = set() # Kinds with removed items, whose bounds are recomputed on the next bounds()
+
+    def _cell_range(self, box):
+        size = self.cell_size
+        return (range(math.floor(box[0] / size), math.floor(box[2] / size) + 1),
+                range(math.floor(box[1] / size), math.floor(box[3] / size) + 1))
+
+    def add(self, kind, key, box, shape=None):
+        # Replaces an existing item of the same kind and key
+        if (kind, key) in self._ids_by_key:
+            self.remove(kind, key)
+        item_id = len(self.keys)
+        box = (float(min(box[0], box[2])), float(min(box[1], box[3])), float(max(box[0], box[2])), float(max(box[1], box[3])))
+        self.kinds.append(kind); self.keys.append(key); self.boxes.append(box); self.shapes.append(shape)
+        self._ids_by_key[(kind, key)] = item_id
+        self._boxes_np = None
+        bounds = self._bounds.get(kind)
+        if bounds is None:
+            self._bounds[kind] = list(box)
+        else:
+            bounds[0] = min(bounds[0], box[0]); bounds[1] = min(bounds[1], box[1])
+            bounds[2] = max(bounds[2], box[2]); bounds[3] = max(bounds[3], box[3])
+        x_cells, y_cells = self._cell_range(box)
+        for ix in x_cells:
+            for iy in y_cells:
+                self.cells.setdefault((ix, iy), []).append(item_id)
+        return item_id
+
+    def remove(self, kind, key):
+        item_id = self._ids_by_key.pop((kind, key), None)
+        if item_id is not None:
+            self.removed.add(item_id)
+            self._stale_bounds.add(kind)
+
+    def add_wall(self, key, start, end):
+        self.add("wall", key, (*start, *end), np.array([start, end], dtype=np.float64))
+
+    def add_curve(self, key, points):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if len(points) == 0: return
+        self.add("curve", key, (*points.min(axis=0), *points.max(axis=0)), points)
+
+    def add_rect(self, kind, key, rect):
+        self.add(kind, key, rect)
+
+    def _candidates(self, box, kind=None):
+        ids = set()
+        x_cells, y_cells = self._cell_range(box)
+        if len(x_cells) * len(y_cells) > len(self.cells): # Huge query: scanning the occupied cells is cheaper
+            for (ix, iy), cell_ids in self.cells.items():
+                if ix in x_cells and iy in y_cells: ids.update(cell_ids)
+        else:
+            for ix in x_cells:
+                for iy in y_cells:
+                    ids.update(self.cells.get((ix, iy), ()))
+        ids -= self.removed
+        if kind is not None:
+            ids = {i for i in ids if self.kinds[i] == kind}
+        return np.fromiter(sorted(ids), dtype=np.int64, count=len(ids))
+
+    def _box_array(self):
+        if self._boxes_np is None:
+            self._boxes_np = np.array(self.boxes, dtype=np.float64).reshape(-1, 4)
+        return self._boxes_np
+
+    def query_rect(self, rect, kind=None):
+        """Keys of items (of one kind, if given) whose bounding box intersects rect=(x_min, y_min, x_max, y_max)."""
+        ids = self._candidates(rect, kind)
+        if len(ids) == 0: return []
+        boxes = self._box_array()[ids]
+        hit = (boxes[:, 0] <= rect[2]) & (boxes[:, 2] >= rect[0]) & (boxes[:, 1] <= rect[3]) & (boxes[:, 3] >= rect[1])
+        return [self.keys[i] for i in ids[hit]]
+
+    def text_in_rect(self, rect):
+        """Keys of text boxes whose centre lies inside rect."""
+        ids = self._candidates(rect, "text")
+        if len(ids) == 0: return []
+        boxes = self._box_array()[ids]
+        cx, cy = (boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2
+        inside = (cx >= rect[0]) & (cx <= rect[2]) & (cy >= rect[1]) & (cy <= rect[3])
+        return [self.keys[i] for i in ids[inside]]
+
+    def walls_near_point(self, x, y, radius):
+        """[(distance, kind, key)] for walls and curved walls within radius of (x, y), nearest first."""
+        box = (x - radius, y - radius, x + radius, y + radius)
+        hits = []
+        for i in self._candidates(box):
+            if self.kinds[i] not in ("wall", "curve"): continue
+            points = self.shapes[i]
+            segments = np.hstack([points[:-1], points[1:]]) if len(points) > 1 else np.hstack([points, points])
+            distance = float(_segment_distances(x, y, segments).min())
+            if distance <= radius:
+                hits.append((distance, self.kinds[i], self.keys[i]))
+        return sorted(hits, key=lambda hit: hit[0])
+
+    def _refresh_bounds(self, kind):
+        # After a removal the bounds may shrink: one pass over the live items of that kind
+        ids = [i for i, item_kind in enumerate(self.kinds) if item_kind == kind and i not in self.removed]
+        if ids:
+            boxes = self._box_array()[ids]
+            self._bounds[kind] = [*boxes[:, :2].min(axis=0), *boxes[:, 2:].max(axis=0)]
+        else:
+            self._bounds.pop(kind, None)
+        self._stale_bounds.discard(kind)
+
+    def bounds(self, kinds=None):
+        """(x_min, y_min, x_max, y_max) over live items (of the given kinds), or None."""
+        boxes = []
+        for kind in (kinds or KINDS):
+            if kind in self._stale_bounds: self._refresh_bounds(kind)
+            if kind in self._bounds: boxes.append(self._bounds[kind])
+        if not boxes: return None
+        return (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+def build_plan_index(walls=(), curved_walls=(), room_dimensions=None, scale_factor=1.0, text_detections=(),
+                     cell_size=None):
+    """Index walls (key: list index), curves (list index), rooms (name) and text detections (list index).
+
+    text_detections are dicts with min/max_x_px and min/max_y_px, as built by extract_room_descriptions.
+    Without cell_size, cells are sized so that an average cell holds a few items.
+    """
+    if cell_size is None:
+        extent = geometry_bounds(walls, curved_walls)
+        n_items = len(walls) + len(curved_walls) + len(room_dimensions or {}) + len(text_detections)
+        if extent is not None and n_items:
+            area = max((extent[2] - extent[0]) * (extent[3] - extent[1]), 1.0)
+            cell_size = max(32.0, math.sqrt(area / n_items) * 2)
+        else:
+            cell_size = 128.0
+    index = SpatialIndex(cell_size)
+    for i, wall in enumerate(walls):
+        index.add_wall(i, wall["start"], wall["end"])
+    for i, curve in enumerate(curved_walls):
+        index.add_curve(i, curve["points"])
+    for name, data in (room_dimensions or {}).items():
+        rect = room_rect_px(data, scale_factor)
+        if rect is not None: index.add_rect("room", name, rect)
+    for i, detection in enumerate(text_detections):
+        index.add_rect("text", i, (detection["min_x_px"], detection["min_y_px"],
+                                   detection["max_x_px"], detection["max_y_px"]))
+    return index
@@ -0,0 +1,195 @@
+"""Synthetic floor plans with known content, for benchmarks and quick checks.
+
+make_plan draws an outer wall, interior walls with doors (a gap with a leaf
+and a swing arc), windows (thin parallel lines in the outer wall), curved
+walls (arcs) and room labels such as ``BEDROOM 12'6" x 10'`` with OpenCV. It
+returns the image together with the ground truth it drew. The same seed
+always gives the same plan.
+"""
+
+import random
+
+import cv2
+import numpy as np
+
+ROOM_NAMES = ("BEDROOM", "KITCHEN", "LIVING", "BATH", "DINING", "OFFICE", "GARAGE", "CLOSET", "STUDY", "DEN")
+
+
+def dimension_string(rng):
+    # Mix of 12'6" x 10', 12' x 10'6" and plain 12' x 10' forms
+    width_ft, length_ft = rng.randint(6, 30), rng.randint(6, 30)
+    width_in, length_in = rng.choice((0, 0, rng.randint(1, 11))), rng.choice((0, 0, rng.randint(1, 11)))
+    width = f"{width_ft}'{width_in}\"" if width_in else f"{width_ft}'"
+    length = f"{length_ft}'{length_in}\"" if length_in else f"{length_ft}'"
+    return f"{width} x {length}", width_ft + width_in / 12.0, length_ft + length_in / 12.0
+
+
+def label_corpus(n, seed=0):
+    """n room labels in the notations found on real plans, as (text, width_ft, length_ft).
+
+    Feet and inches (12'6" x 10', 12'-6" x 10'-0", typographic quotes, 12 ft 6 in), plain feet and inches
+    (12 x 10, 150 x 120), metres (3.6 x 4.2 m, 3,6m x 4,2m), centimetres and millimetres. About one label in
+    ten has no dimensions (width and length None). The same seed always gives the same labels.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        name = rng.choice(ROOM_NAMES)
+        style = rng.randrange(10)
+        width_ft, length_ft = rng.randint(6, 30), rng.randint(6, 30)
+        width_in, length_in = rng.randint(0, 11), rng.randint(0, 11)
+        if style == 0:
+            corpus.append((f"{name} {rng.randint(1, 4)}", None, None)); continue
+        if style <= 3:
+            text, width, length = dimension_string(rng)
+            text = text.replace("x", rng.choice(("x", "X", "×")), 1)
+            if style == 3: text = text.replace("'", "’").replace('"', "”")
+            corpus.append((f"{name} {text}", width, length)); continue
+        width, length = width_ft + width_in / 12.0, length_ft + length_in / 12.0
+        if style == 4:
+            corpus.append((f"{name} {width_ft}'-{width_in}\" x {length_ft}'-{length_in}\"", width, length))
+        elif style == 5:
+            corpus.append((f"{name} {width_ft} ft {width_in} in x {length_ft} ft {length_in} in", width, length))
+        elif style == 6:
+            if rng.random() < 0.5:
+                corpus.append((f"{name} {width_ft} x {length_ft}", width_ft, length_ft))
+            else:
+                corpus.append((f"{name} {min(width_ft, 29) * 12} x {min(length_ft, 29) * 12}",
+                               min(width_ft, 29), min(length_ft, 29)))
+        else:
+            width_m, length_m = rng.randint(180, 900) / 100, rng.randint(180, 900) / 100
+            if style == 7:
+                text = f"{width_m:.2f} x {length_m:.2f} m" if rng.random() < 0.5 else f"{width_m:.2f}m x {length_m:.2f}m"
+            elif style == 8:
+                text = f"{width_m * 100:.0f} x {length_m * 100:.0f} cm" if rng.random() < 0.5 else f"{width_m * 1000:.0f} x {length_m * 1000:.0f} mm"
+            else:
+                text = f"{width_m:.1f}".replace(".", ",") + " x " + f"{length_m:.1f}".replace(".", ",") + " m"
+                width_m, length_m = round(width_m, 1), round(length_m, 1)
+            corpus.append((f"{name} {text}", width_m / 0.3048, length_m / 0.3048))
+    return corpus
+
+
+def _word_boxes(text, x, y, font_scale, thickness):
+    # EasyOCR-style results for each word of text drawn by putText at baseline origin (x, y)
+    results = []
+    start = 0
+    for word in text.split(" "):
+        left = x + (cv2.getTextSize(text[:start], cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)[0][0] if start else 0)
+        (word_w, word_h), baseline = cv2.getTextSize(word, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+        box = [[left, y - word_h], [left + word_w, y - word_h], [left + word_w, y + baseline], [left, y + baseline]]
+        results.append((box, word, 1.0))
+        start += len(word) + 1
+    return results
+
+
+def make_plan(width=2000, height=1500, n_walls=40, n_curves=4, n_labels=12, seed=0, wall_px=None, n_windows=None):
+    """Return (BGR image, truth) where truth has "walls", "openings", "curves" and "labels" lists.
+
+    truth["ocr"] holds what a perfect OCR pass would return for the labels: one (bbox, text, confidence)
+    per word, in EasyOCR's format.
+
+    n_walls counts drawn walls before door gaps split them, so truth["walls"] is usually longer. Openings are
+    {"type": "door" | "window", "center": (x, y), "width_px": w}; n_windows defaults to one per 10 walls.
+    truth["scale_factor"] is the plan scale in pixels per foot that makes the doors 3 ft wide.
+    """
+    rng = random.Random(seed)
+    wall_px = wall_px or max(3, round(min(width, height) / 200))
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+    margin = max(wall_px * 4, min(width, height) // 20)
+    x0, y0, x1, y1 = margin, margin, width - margin, height - margin
+    truth = {"walls": [], "openings": [], "curves": [], "labels": [], "ocr": []}
+    symbol_px = max(1, wall_px // 4)
+
+    def wall(p1, p2):
+        cv2.line(image, p1, p2, (0, 0, 0), wall_px)
+        truth["walls"].append((p1, p2))
+
+    for p1, p2 in (((x0, y0), (x1, y0)), ((x1, y0), (x1, y1)), ((x1, y1), (x0, y1)), ((x0, y1), (x0, y0))):
+        wall(p1, p2)
+
+    door_px = max(wall_px * 6, min(width, height) // 40)
+    truth["scale_factor"] = door_px / 3.0
+    min_wall_px = door_px * 3
+
+    def door(hinge, along, side):
+        # Leaf perpendicular to the wall at the hinge and a quarter swing arc to the far side of the gap.
+        # OpenCV angles run clockwise from +x in image coordinates (90 = +y)
+        hx, hy = hinge
+        if along == "x":
+            cv2.line(image, (hx, hy), (hx, hy + side * door_px), (0, 0, 0), symbol_px)
+            start, end = (0, 90) if side > 0 else (270, 360)
+            center = (hx + door_px / 2, hy)
+        else:
+            cv2.line(image, (hx, hy), (hx + side * door_px, hy), (0, 0, 0), symbol_px)
+            start, end = (0, 90) if side > 0 else (90, 180)
+            center = (hx, hy + door_px / 2)
+        cv2.ellipse(image, (hx, hy), (door_px, door_px), 0, start, end, (0, 0, 0), symbol_px)
+        truth["openings"].append({"type": "door", "center": center, "width_px": door_px})
+    for _ in range(max(0, n_walls - 4)):
+        # Axis-aligned interior wall between the outer walls, split by one door gap
+        if rng.random() < 0.5:
+            y = rng.randint(y0 + margin, y1 - margin)
+            a, b = sorted(rng.sample(range(x0, x1, max(1, wall_px)), 2))
+            if b - a < min_wall_px: b = min(x1, a + min_wall_px)
+            gap = min(b, rng.randint(a + door_px, max(a + door_px, b - 2 * door_px)))
+            wall((a, y), (gap, y))
+            if b - gap - door_px > door_px:
+                wall((gap + door_px, y), (b, y))
+                if rng.random() < 0.8: door((gap, y), "x", rng.choice((-1, 1)))
+        else:
+            x = rng.randint(x0 + margin, x1 - margin)
+            a, b = sorted(rng.sample(range(y0, y1, max(1, wall_px)), 2))
+            if b - a < min_wall_px: b = min(y1, a + min_wall_px)
+            gap = min(b, rng.randint(a + door_px, max(a + door_px, b - 2 * door_px)))
+            wall((x, a), (x, gap))
+            if b - gap - door_px > door_px:
+                wall((x, gap + door_px), (x, b))
+                if rng.random() < 0.8: door((x, gap), "y", rng.choice((-1, 1)))
+
+    window_px = door_px * 3 // 2
+    for _ in range(n_windows if n_windows is not None else max(1, n_walls // 10)):
+        # Window symbol in an outer wall: the wall is cut and replaced by three thin lines and two end ticks
+        half = wall_px // 2
+        if rng.random() < 0.5:
+            y = rng.choice((y0, y1))
+            a = rng.randint(x0 + door_px, max(x0 + door_px, x1 - door_px - window_px))
+            cv2.line(image, (a, y), (a + window_px, y), (255, 255, 255), wall_px + 2)
+            for dy in (-half, 0, half):
+                cv2.line(image, (a, y + dy), (a + window_px, y + dy), (0, 0, 0), 1)
+            for tick_x in (a, a + window_px):
+                cv2.line(image, (tick_x, y - half), (tick_x, y + half), (0, 0, 0), 1)
+            truth["openings"].append({"type": "window", "center": (a + window_px / 2, y), "width_px": window_px})
+        else:
+            x = rng.choice((x0, x1))
+            a = rng.randint(y0 + door_px, max(y0 + door_px, y1 - door_px - window_px))
+            cv2.line(image, (x, a), (x, a + window_px), (255, 255, 255), wall_px + 2)
+            for dx in (-half, 0, half):
+                cv2.line(image, (x + dx, a), (x + dx, a + window_px), (0, 0, 0), 1)
+            for tick_y in (a, a + window_px):
+                cv2.line(image, (x - half, tick_y), (x + half, tick_y), (0, 0, 0), 1)
+            truth["openings"].append({"type": "window", "center": (x, a + window_px / 2), "width_px": window_px})
+
+    for _ in range(n_curves):
+        radius = rng.randint(min(width, height) // 20, min(width, height) // 6)
+        center = (rng.randint(x0 + radius, max(x0 + radius, x1 - radius)),
+                  rng.randint(y0 + radius, max(y0 + radius, y1 - radius)))
+        start = rng.randint(0, 359)
+        cv2.ellipse(image, center, (radius, radius), 0, start, start + rng.randint(60, 180), (0, 0, 0), wall_px)
+        truth["curves"].append({"center": center, "radius": radius})
+
+    font_scale = max(0.4, min(width, height) / 2000)
+    thickness = max(1, round(font_scale * 2))
+    for _ in range(n_labels):
+        name = rng.choice(ROOM_NAMES)
+        dim_str, width_ft, length_ft = dimension_string(rng)
+        (text_w, text_h), _ = cv2.getTextSize(dim_str, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+        x = rng.randint(x0 + wall_px * 2, max(x0 + wall_px * 2, x1 - text_w - wall_px * 2))
+        y = rng.randint(y0 + text_h * 3, max(y0 + text_h * 3, y1 - text_h))
+        cv2.putText(image, name, (x, y - int(text_h * 1.6)), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0),
+                    thickness, cv2.LINE_AA)
+        cv2.putText(image, dim_str, (x, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), thickness, cv2.LINE_AA)
+        truth["labels"].append({"name": name, "text": dim_str, "position": (x, y),
+                                "width_ft": width_ft, "length_ft": length_ft})
+        truth["ocr"].extend(_word_boxes(name, x, y - int(text_h * 1.6), font_scale, thickness))
+        truth["ocr"].extend(_word_boxes(dim_str, x, y, font_scale, thickness))
+    return image, truth
@@ -0,0 +1,82 @@
+"""Grouping of OCR word boxes into labels, in reading order.
+
+Two boxes belong to the same label when they sit on one line with a word
+gap between them, or on consecutive lines of one text block:
+
+- same line: they overlap vertically and the horizontal gap is at most
+  WORD_GAP text heights,
+- stacked: they overlap horizontally and the vertical gap is at most
+  LINE_GAP text heights.
+
+Distances are relative to the text height, so the grouping works the same
+for small and large lettering. The boxes are hashed into a uniform grid
+(floorplan.spatial.SpatialIndex), each box only tests the boxes in the grid
+cells it reaches, and neighbours are joined with union-find. On a plan with
+evenly spread text this takes linear time, with no scikit-learn import.
+"""
+
+import numpy as np
+
+from floorplan.spatial import SpatialIndex
+
+WORD_GAP = 1.5 # Largest gap between words on one line, in text heights
+LINE_GAP = 1.0 # Largest gap between lines of one label, in text heights
+
+
+def _boxes(detections):
+    return np.array([(d["min_x_px"], d["min_y_px"], d["max_x_px"], d["max_y_px"]) for d in detections],
+                    dtype=np.float64).reshape(-1, 4)
+
+
+def _reading_order(boxes, members):
+    # Lines top to bottom (a box joins the current line while its centre is above the line's bottom), words left
+    # to right within a line
+    members = sorted(members, key=lambda i: (boxes[i, 1] + boxes[i, 3]) / 2)
+    lines, line_bottom = [], None
+    for i in members:
+        if line_bottom is None or (boxes[i, 1] + boxes[i, 3]) / 2 > line_bottom:
+            lines.append([]); line_bottom = boxes[i, 3]
+        lines[-1].append(i)
+        line_bottom = max(line_bottom, boxes[i, 3])
+    return [i for line in lines for i in sorted(line, key=lambda i: boxes[i, 0])]
+
+
+def group_text(detections, word_gap=WORD_GAP, line_gap=LINE_GAP):
+    """Groups of detection indices, each in reading order; groups are ordered by their first detection.
+
+    detections are dicts with min/max_x_px and min/max_y_px, as built by extract_room_descriptions.
+    """
+    if not detections: return []
+    boxes = _boxes(detections)
+    heights = np.maximum(boxes[:, 3] - boxes[:, 1], 1.0)
+    reach = heights * max(word_gap, line_gap)
+    # Cells about the size of a word, so a box and its reach cover only a few of them
+    cell_size = max(float(np.median(boxes[:, 2] - boxes[:, 0] + reach)), 8.0)
+    index = SpatialIndex(cell_size)
+    for i, box in enumerate(boxes):
+        index.add_rect("text", i, box)
+
+    parent = list(range(len(boxes)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, (x0, y0, x1, y1) in enumerate(boxes):
+        r = reach[i]
+        for j in index.query_rect((x0 - r, y0 - r, x1 + r, y1 + r), "text"):
+            if j == i: continue # Both boxes of a pair test it, each with its own reach
+            height = max(heights[i], heights[j])
+            gap_x = max(boxes[j, 0] - x1, x0 - boxes[j, 2])
+            gap_y = max(boxes[j, 1] - y1, y0 - boxes[j, 3])
+            same_line = gap_y < 0 and gap_x <= word_gap * height
+            stacked = gap_x < 0 and gap_y <= line_gap * height
+            if same_line or stacked:
+                parent[find(i)] = find(j)
+
+    groups = {}
+    for i in range(len(boxes)):
+        groups.setdefault(find(i), []).append(i)
+    return [_reading_order(boxes, members) for members in groups.values()]
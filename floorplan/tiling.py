@@ -0,0 +1,153 @@
+"""Tiled and coarse-to-fine line segment detection for very large scans.
+
+The image is cut into a grid of tiles. Each tile is processed with an extra
+overlap border, so local filters (blur, adaptive threshold, morphology, Canny)
+see the same neighbourhood as on the full image. Tiles run on a thread pool;
+OpenCV releases the GIL, so they really run in parallel. Every tile keeps only
+the part of its segments that lies inside its own core box, and pieces that
+meet on a seam are joined back into one segment afterwards.
+
+In pyramid mode a downscaled pass proposes which tiles contain lines, and
+only those tiles are processed at full resolution.
+"""
+
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+DEFAULT_TILE_SIZE = 2048
+DEFAULT_TILE_OVERLAP_PX = 64
+SEAM_TOLERANCE_PX = 3
+SEAM_ANGLE_TOLERANCE_DEG = 7
+
+
+def tile_grid(height, width, tile_size):
+    # Core boxes (x0, y0, x1, y1) of a regular grid; they share edges but do not overlap
+    return [(x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height))
+            for y0 in range(0, height, tile_size) for x0 in range(0, width, tile_size)]
+
+
+def _clip_segments(segments, box):
+    # Liang-Barsky clipping of (N, 4) float segments to the closed box (x0, y0, x1, y1)
+    x0, y0, x1, y1 = box
+    sx, sy = segments[:, 0], segments[:, 1]
+    dx, dy = segments[:, 2] - sx, segments[:, 3] - sy
+    t_min = np.zeros(len(segments))
+    t_max = np.ones(len(segments))
+    keep = np.ones(len(segments), dtype=bool)
+    for p, q in ((-dx, sx - x0), (dx, x1 - sx), (-dy, sy - y0), (dy, y1 - sy)):
+        parallel = p == 0
+        keep &= ~(parallel & (q < 0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.where(parallel, 0.0, q / np.where(parallel, 1, p))
+        t_min = np.where(~parallel & (p < 0), np.maximum(t_min, t), t_min)
+        t_max = np.where(~parallel & (p > 0), np.minimum(t_max, t), t_max)
+    keep &= t_min <= t_max
+    clipped = np.stack([sx + t_min * dx, sy + t_min * dy, sx + t_max * dx, sy + t_max * dy], axis=1)
+    return clipped[keep]
+
+
+def _detect_tile(image, core_box, overlap_px, segment_fn):
+    height, width = image.shape[:2]
+    x0, y0, x1, y1 = core_box
+    ox0, oy0 = max(0, x0 - overlap_px), max(0, y0 - overlap_px)
+    ox1, oy1 = min(width, x1 + overlap_px), min(height, y1 + overlap_px)
+    lines = segment_fn(image[oy0:oy1, ox0:ox1]) # A view, no copy of the tile
+    if lines is None or len(lines) == 0:
+        return np.empty((0, 4))
+    segments = np.asarray(lines, dtype=np.float64).reshape(-1, 4) + (ox0, oy0, ox0, oy0)
+    segments = _clip_segments(segments, core_box)
+    return segments[np.hypot(segments[:, 2] - segments[:, 0], segments[:, 3] - segments[:, 1]) >= 1]
+
+
+def _stitch_seams(segments, tile_size):
+    # Joins pieces whose endpoints meet on a tile seam with a similar angle (union-find over
+    # endpoint buckets), then replaces each joined chain by its two outermost endpoints.
+    n = len(segments)
+    if n == 0:
+        return segments
+    points = segments.reshape(-1, 2)
+    on_seam_x = np.abs(points[:, 0] - np.round(points[:, 0] / tile_size) * tile_size) <= 0.5
+    on_seam_y = np.abs(points[:, 1] - np.round(points[:, 1] / tile_size) * tile_size) <= 0.5
+    seam_points = np.flatnonzero(on_seam_x | on_seam_y)
+    angles = np.degrees(np.arctan2(segments[:, 3] - segments[:, 1], segments[:, 2] - segments[:, 0])) % 180
+
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    buckets = {}
+    for idx in seam_points.tolist():
+        key = (int(points[idx, 0] // SEAM_TOLERANCE_PX), int(points[idx, 1] // SEAM_TOLERANCE_PX))
+        buckets.setdefault(key, []).append(idx)
+    for idx in seam_points.tolist():
+        cx, cy = int(points[idx, 0] // SEAM_TOLERANCE_PX), int(points[idx, 1] // SEAM_TOLERANCE_PX)
+        for nx in (cx - 1, cx, cx + 1):
+            for ny in (cy - 1, cy, cy + 1):
+                for other in buckets.get((nx, ny), ()):
+                    a, b = idx // 2, other // 2
+                    if a >= b: continue
+                    if np.hypot(*(points[idx] - points[other])) > SEAM_TOLERANCE_PX: continue
+                    angle_diff = abs(angles[a] - angles[b])
+                    if min(angle_diff, 180 - angle_diff) > SEAM_ANGLE_TOLERANCE_DEG: continue
+                    parent[find(a)] = find(b)
+
+    groups = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+    stitched = []
+    for members in groups.values():
+        if len(members) == 1:
+            stitched.append(segments[members[0]])
+            continue
+        member_points = segments[members].reshape(-1, 2)
+        direction = np.radians(angles[members[0]])
+        proj = member_points @ np.array([math.cos(direction), math.sin(direction)])
+        p_start, p_end = member_points[np.argmin(proj)], member_points[np.argmax(proj)]
+        stitched.append(np.concatenate([p_start, p_end]))
+    return np.array(stitched)
+
+
+def _active_tiles(image, tile_boxes, tile_size, coarse_scale, segment_fn):
+    # Coarse pass: segments found on the downscaled image mark the tiles they cross (plus neighbours)
+    height, width = image.shape[:2]
+    coarse = cv2.resize(image, (max(1, int(width * coarse_scale)), max(1, int(height * coarse_scale))),
+                        interpolation=cv2.INTER_AREA)
+    lines = segment_fn(coarse)
+    occupancy = np.zeros((math.ceil(height / tile_size), math.ceil(width / tile_size)), dtype=np.uint8)
+    if lines is not None:
+        for x1, y1, x2, y2 in np.asarray(lines, dtype=np.float64).reshape(-1, 4) / coarse_scale:
+            cv2.line(occupancy, (int(x1 // tile_size), int(y1 // tile_size)),
+                     (int(x2 // tile_size), int(y2 // tile_size)), 1, 1)
+    occupancy = cv2.dilate(occupancy, np.ones((3, 3), np.uint8))
+    return [box for box in tile_boxes if occupancy[box[1] // tile_size, box[0] // tile_size]]
+
+
+def tiled_segments(image, segment_fn, tile_size, overlap_px=DEFAULT_TILE_OVERLAP_PX, coarse_scale=None,
+                   max_workers=None):
+    """Run segment_fn (image -> HoughLinesP-style lines) tile by tile and stitch the result.
+
+    Returns an (N, 1, 4) int32 array like cv2.HoughLinesP, or None when nothing is found.
+    """
+    height, width = image.shape[:2]
+    tile_size = tile_size or DEFAULT_TILE_SIZE
+    boxes = tile_grid(height, width, tile_size)
+    if coarse_scale:
+        boxes = _active_tiles(image, boxes, tile_size, coarse_scale, segment_fn)
+    if not boxes:
+        return None
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        tile_results = list(pool.map(lambda box: _detect_tile(image, box, overlap_px, segment_fn), boxes))
+    segments = np.concatenate(tile_results) if tile_results else np.empty((0, 4))
+    segments = _stitch_seams(segments, tile_size)
+    if len(segments) == 0:
+        return None
+    return np.round(segments).astype(np.int32).reshape(-1, 1, 4)
@@ -0,0 +1,81 @@
+"""Detection runs in a child process, so they can be stopped at any point.
+
+AnalysisWorker keeps one spawned child that runs engine.analyze on each
+submitted image and reports through a queue: ("status", message) while it
+runs, then ("done", PlanResult) or ("error", message). The child keeps the
+EasyOCR reader and the detection cache between runs. terminate() kills the
+child in the middle of any stage, an OCR pass included; the next submit
+starts a fresh one. The image is decoded in the child, so the pixels are
+never copied between processes.
+"""
+
+import multiprocessing
+import traceback
+
+from floorplan import engine, ocr, profiling
+from floorplan.cache import cache_from_env
+from floorplan.imageio import load_image
+from floorplan.profiling import Profile
+
+
+def _run(cache, messages, image_path, scale_factor, room_dimensions, room_positions, ocr_results, report_path,
+         prof_path):
+    profile = Profile()
+    with profiling.cprofile(prof_path):
+        # Grayscale, decoded once and masked in place by the engine: see floorplan.imageio
+        with profile.stage("image_decode"):
+            plan_image = load_image(image_path, grayscale=True)
+        # Stored OCR results (e.g. from a reopened project) replace the OCR pass: do not load EasyOCR for them
+        reader = ocr.get_reader() if ocr_results is None else None
+        result = engine.analyze(plan_image, scale_factor, reader=reader, room_dimensions=room_dimensions,
+                                room_positions=room_positions,
+                                report_status=lambda message: messages.put(("status", message)),
+                                cache=cache, inplace=True, profile=profile, ocr_results=ocr_results)
+    if report_path:
+        result.profile.write_json(report_path, command="process_image", image=image_path, scale=scale_factor,
+                                  walls=len(result.walls), curved_walls=len(result.curved_walls),
+                                  rooms=len(result.room_dimensions))
+    return result
+
+
+def _serve(jobs, messages):
+    cache = cache_from_env()
+    while True:
+        job = jobs.get()
+        if job is None: return
+        try:
+            messages.put(("done", _run(cache, messages, **job)))
+        except Exception as e:
+            traceback.print_exc()
+            messages.put(("error", str(e) or type(e).__name__))
+
+
+class AnalysisWorker:
+    def __init__(self):
+        self.process = None
+        self.jobs = None
+        self.messages = None
+
+    def submit(self, image_path, scale_factor, room_dimensions=None, room_positions=None, ocr_results=None,
+               report_path=None, prof_path=None):
+        """Start analysing image_path; returns the queue the run reports to. One run at a time."""
+        if not self.is_alive():
+            # Spawned, not forked: the GUI process has Tk and VTK state (and maybe CUDA) that a fork must not copy
+            context = multiprocessing.get_context("spawn")
+            self.jobs, self.messages = context.Queue(), context.Queue()
+            self.process = context.Process(target=_serve, args=(self.jobs, self.messages), daemon=True)
+            self.process.start()
+        self.jobs.put({"image_path": image_path, "scale_factor": scale_factor, "room_dimensions": room_dimensions,
+                       "room_positions": room_positions, "ocr_results": ocr_results, "report_path": report_path,
+                       "prof_path": prof_path})
+        return self.messages
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def terminate(self):
+        # Stops the running stage at once. A queue may be left half-written, so both go with the process
+        if self.process is None: return
+        self.process.terminate()
+        self.process.join()
+        self.process = self.jobs = self.messages = None